@@ -100,6 +100,30 @@ DATABASES = {
 }
 
 
+# Cache
+# Shared between processes (e.g. uWSGI workers) by default, since cached values
+# are invalidated by writes in any process. Run ./manage.py createcachetable
+# when using the default database cache.
+# The database cache only suits development: answering a conditional request
+# with a 304 then still takes a database query for the table versions, so
+# production should use memcached (see the README.)
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get("FMS_CACHE_BACKEND", "django.core.cache.backends.db.DatabaseCache"),
+        "LOCATION": os.environ.get("FMS_CACHE_LOCATION", "fms_cache"),
+    }
+}
+
+
+# Pagination
+# List results are only counted up to this many rows; past it, the query planner's
+# estimate is reported instead, since counting with every filter join dominates
+# the response time of large tables (e.g. versions.)
+
+FMS_EXACT_COUNT_THRESHOLD = int(os.environ.get("FMS_EXACT_COUNT_THRESHOLD", "10000"))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
@@ -137,7 +161,7 @@ REST_FRAMEWORK = {
         'rest_framework_csv.renderers.CSVRenderer',
     ),
     'EXCEPTION_HANDLER': 'fms_core.exception_handler.fms_exception_handler',
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
+    'DEFAULT_PAGINATION_CLASS': 'fms_core.pagination.EstimatedCountPagination',
     'PAGE_SIZE': 100,
 }
 
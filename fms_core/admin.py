@@ -4,7 +4,7 @@ from django.contrib import admin
 from django.templatetags.static import static
 from django.utils.html import format_html
 
-from .containers import ContainerSpec, PARENT_CONTAINER_KINDS
+from .containers import CONTAINER_KIND_PARENTS, PARENT_CONTAINER_KINDS
 from .models import (
     Container,
     ContainerMove,
@@ -52,11 +52,7 @@ class ContainerForm(forms.ModelForm):
         if kwargs.get("instance"):
             # If we're in edit mode
             self.fields["location"].queryset = Container.objects.filter(
-                kind__in=tuple(
-                    c.container_kind_id for c in ContainerSpec.container_specs
-                    if c.can_hold_kind(self.instance.kind)
-                )
-            )
+                kind__in=CONTAINER_KIND_PARENTS.get(self.instance.kind, frozenset()))
             return
 
         self.fields["location"].queryset = Container.objects.filter(kind__in=PARENT_CONTAINER_KINDS)
@@ -146,7 +142,7 @@ class SampleAdmin(AggregatedAdmin):
         "individual",
         "container",
         "coordinates",
-        "volume",
+        "current_volume",
         "concentration",
         "is_depleted",
     )
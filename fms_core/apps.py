@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class FmsCoreConfig(AppConfig):
     name = "fms_core"
     verbose_name = "Sample Tracking"
+
+    def ready(self):
+        # Connect signal receivers
+        from . import signals  # noqa: F401
@@ -0,0 +1,136 @@
+"""
+Cache helpers based on per-table version tokens. Every tracked table has a
+version token which is replaced whenever the table is written to; cache keys
+for values derived from a set of tables include the tables' current tokens,
+so that any write invalidates every such value without having to know which
+keys were derived from it. The same tokens make up the ETags of responses
+derived from the tables, so that conditional requests can be answered
+without querying them.
+"""
+
+import functools
+import hashlib
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Model
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from typing import Callable, Iterable, Tuple, Type
+
+
+__all__ = [
+    "SUMMARY_TIMEOUT",
+    "get_table_versions",
+    "bump_table_versions",
+    "schedule_table_version_bump",
+    "cached_for_tables",
+    "conditional_response",
+    "conditional_for_tables",
+]
+
+
+SUMMARY_TIMEOUT = 60 * 60 * 24  # Stale keys are never read again, so just let them expire eventually
+
+
+def _table_version_key(model: Type[Model]) -> str:
+    return f"table_version:{model._meta.label_lower}"
+
+
+def get_table_versions(models: Iterable[Type[Model]]) -> Tuple[str, ...]:
+    models = tuple(models)
+    keys = [_table_version_key(m) for m in models]
+    versions = cache.get_many(keys)
+
+    missing = {k: uuid.uuid4().hex for k in keys if k not in versions}
+    if missing:
+        # Tokens only have to change on writes; if a token was evicted, any new value will do.
+        cache.set_many(missing, None)
+        versions.update(missing)
+
+    return tuple(versions[k] for k in keys)
+
+
+def bump_table_versions(*models: Type[Model]):
+    cache.set_many({_table_version_key(m): uuid.uuid4().hex for m in models}, None)
+
+
+class _TableVersionBump:
+    def __init__(self, model: Type[Model]):
+        self.model = model
+
+    def __call__(self):
+        bump_table_versions(self.model)
+
+    def __eq__(self, other):
+        return isinstance(other, _TableVersionBump) and other.model == self.model
+
+
+def schedule_table_version_bump(model: Type[Model], using=None):
+    """
+    Bumps a table's version once the current transaction commits, so that
+    concurrent readers cannot cache values computed from uncommitted data.
+    Bumps are only scheduled once per table and transaction, since imports
+    may save hundreds of objects in a row.
+    """
+
+    bump = _TableVersionBump(model)
+    connection = transaction.get_connection(using)
+    if connection.in_atomic_block and any(f == bump for _, f in connection.run_on_commit):
+        return
+    transaction.on_commit(bump, using=using)
+
+
+def cached_for_tables(name: str, models: Iterable[Type[Model]], compute: Callable[[], object],
+                      timeout: int = SUMMARY_TIMEOUT):
+    """
+    Returns the cached value of compute(), for as long as none of the
+    specified models' tables are written to.
+    """
+    key = f"{name}:{':'.join(get_table_versions(models))}"
+    return cache.get_or_set(key, compute, timeout)
+
+
+def conditional_response(request, versions: Iterable[str], get_response: Callable[[], HttpResponse]) -> HttpResponse:
+    """
+    Tags the response to a request with an ETag built from the request URL
+    and the specified version tokens. Requests carrying a matching
+    If-None-Match header are answered with a 304 without calling
+    get_response.
+    """
+
+    # The same URL may be rendered differently, e.g. by the browsable API
+    parts = (request.get_full_path(), request.META.get("HTTP_ACCEPT", ""), *versions)
+    etag = f'"{hashlib.sha1(":".join(parts).encode("utf-8")).hexdigest()}"'
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = get_response()
+
+    if response.status_code in (200, 304):
+        response["ETag"] = etag
+        # Clients may keep the response, but should always check that it is still current
+        patch_cache_control(response, no_cache=True)
+
+    return response
+
+
+def conditional_for_tables(*models: Type[Model]):
+    """
+    Decorates a viewset method whose response is derived only from the
+    specified models' tables (and the request URL), tagging responses with
+    an ETag built from the tables' version tokens. Requests carrying a
+    matching If-None-Match header are answered with a 304 without running
+    the view, and thus without querying the database.
+    """
+
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            return conditional_response(request, (view_method.__qualname__, *get_table_versions(models)),
+                                        lambda: view_method(self, request, *args, **kwargs))
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,101 @@
+import json
+
+from django.db.models import Exists, OuterRef, QuerySet, Subquery
+from reversion.models import Version
+from typing import Dict, Iterable, List, Optional
+
+from .models import FieldChange
+
+
+__all__ = [
+    "get_field_changes",
+    "get_serialized_fields",
+    "record_field_changes",
+    "with_has_previous_version",
+    "with_previous_serialized_data",
+]
+
+
+def _previous_versions() -> QuerySet:
+    # Versions of the same object as the outer version, saved before it
+    return Version.objects.filter(
+        content_type_id=OuterRef("content_type_id"),
+        object_id=OuterRef("object_id"),
+        db=OuterRef("db"),
+        pk__lt=OuterRef("pk"),
+    )
+
+
+def with_previous_serialized_data(queryset: QuerySet) -> QuerySet:
+    """
+    Annotates each version of a queryset with the serialized data of the
+    previous version of the same object, or None for an object's first
+    version.
+    """
+
+    previous_versions = _previous_versions().order_by("-pk")
+    return queryset.annotate(previous_serialized_data=Subquery(previous_versions.values("serialized_data")[:1]))
+
+
+def with_has_previous_version(queryset: QuerySet) -> QuerySet:
+    """
+    Annotates each version of a queryset with whether it has a previous
+    version of the same object, i.e. whether it is not the object's first.
+    """
+
+    return queryset.annotate(has_previous_version=Exists(_previous_versions()))
+
+
+def get_serialized_fields(serialized_data: str) -> dict:
+    try:
+        return json.loads(serialized_data)[0]["fields"]
+    except (ValueError, LookupError, TypeError):
+        return {}
+
+
+def get_field_changes(version: Version, previous_serialized_data: Optional[str]) -> List[FieldChange]:
+    """
+    Returns the (unsaved) changes made to the fields of an object in a
+    version, compared to the previous version. Nothing is logged for an
+    object's first version.
+    """
+
+    if previous_serialized_data is None:
+        return []
+
+    fields = get_serialized_fields(version.serialized_data)
+    previous_fields = get_serialized_fields(previous_serialized_data)
+
+    return [
+        FieldChange(
+            version=version,
+            revision_id=version.revision_id,
+            content_type_id=version.content_type_id,
+            object_id=version.object_id,
+            date=version.revision.date_created,
+            field=field,
+            old_value=previous_fields.get(field),
+            new_value=fields.get(field),
+        )
+        for field in sorted(fields.keys() | previous_fields.keys())
+        if fields.get(field) != previous_fields.get(field)
+    ]
+
+
+def record_field_changes(versions: Iterable[Version]) -> int:
+    """
+    Logs the field changes of newly saved versions, finding their previous
+    versions with a single query. Returns the number of changes logged.
+    """
+
+    versions = list(versions)
+    if not versions:
+        return 0
+
+    previous_data: Dict[int, Optional[str]] = dict(
+        with_previous_serialized_data(Version.objects.filter(pk__in=[v.pk for v in versions]))
+        .values_list("pk", "previous_serialized_data"))
+
+    changes = [c for v in versions for c in get_field_changes(v, previous_data.get(v.pk))]
+    FieldChange.objects.bulk_create(changes)
+    return len(changes)
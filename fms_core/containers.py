@@ -1,5 +1,9 @@
-from typing import Dict, List, Tuple
-from .coordinates import CoordinateSpec, alphas, ints, validate_and_normalize_coordinates
+import hashlib
+import json
+
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Tuple
+from .coordinates import CoordinateSpec, CoordinateValidator, alphas, ints, get_coordinate_validator
 
 
 __all__ = [
@@ -29,6 +33,12 @@ __all__ = [
     "NON_SAMPLE_CONTAINER_KINDS",
     "SAMPLE_CONTAINER_KINDS_WITH_COORDS",
     "PARENT_CONTAINER_KINDS",
+
+    "CONTAINER_KIND_CHILDREN",
+    "CONTAINER_KIND_PARENTS",
+    "CONTAINER_KINDS",
+    "CONTAINER_KINDS_JSON",
+    "CONTAINER_KINDS_ETAG",
 ]
 
 
@@ -39,8 +49,10 @@ class ContainerSpec:
                  children: Tuple["ContainerSpec", ...]):
         self._container_kind_id = container_kind_id
         self._coordinate_spec = coordinate_spec
+        self._coordinate_validator: CoordinateValidator = get_coordinate_validator(coordinate_spec)
         self._coordinate_overlap_allowed = coordinate_overlap_allowed
         self._children = children
+        self._children_ids: FrozenSet[str] = frozenset(c.container_kind_id for c in children)
         for c in children:
             c.register_parent(self)
 
@@ -53,6 +65,7 @@ class ContainerSpec:
 
     def add_child(self, spec: "ContainerSpec"):
         self._children = (*self._children, spec)
+        self._children_ids = self._children_ids | {spec.container_kind_id}
 
     @property
     def is_source(self) -> bool:
@@ -78,11 +91,18 @@ class ContainerSpec:
     def sample_holding(self) -> bool:
         return len(self._children) == 0
 
-    def can_hold_kind(self, kind_id: str):
-        return next((c for c in self._children if c.container_kind_id == kind_id), None) is not None
+    @property
+    def children_ids(self) -> FrozenSet[str]:
+        return self._children_ids
+
+    def can_hold_kind(self, kind_id: str) -> bool:
+        return kind_id in self._children_ids
 
     def validate_and_normalize_coordinates(self, coordinates: str) -> str:
-        return validate_and_normalize_coordinates(coordinates, self._coordinate_spec)
+        return self._coordinate_validator.validate(coordinates)
+
+    def validate_many(self, coordinates: Iterable[str]) -> List[str]:
+        return self._coordinate_validator.validate_many(coordinates)
 
     def serialize(self) -> dict:
         return {
@@ -268,3 +288,20 @@ SAMPLE_CONTAINER_KINDS_WITH_COORDS: Tuple[str, ...] = tuple(c.container_kind_id
 
 PARENT_CONTAINER_KINDS: Tuple[str, ...] = tuple(c.container_kind_id for c in ContainerSpec.container_specs
                                                 if c.children)
+
+# Adjacency maps of container kinds, by kind ID: which kinds each kind can hold, and which kinds can hold each kind
+CONTAINER_KIND_CHILDREN: Mapping[str, FrozenSet[str]] = MappingProxyType({
+    c.container_kind_id: c.children_ids
+    for c in ContainerSpec.container_specs
+})
+
+CONTAINER_KIND_PARENTS: Mapping[str, FrozenSet[str]] = MappingProxyType({
+    c.container_kind_id: frozenset(
+        parent_id for parent_id, children_ids in CONTAINER_KIND_CHILDREN.items() if c.container_kind_id in children_ids)
+    for c in ContainerSpec.container_specs
+})
+
+# Specs are fixed for the lifetime of the application, so the container kinds endpoint is serialized once
+CONTAINER_KINDS: List[dict] = [c.serialize() for c in ContainerSpec.container_specs]
+CONTAINER_KINDS_JSON: bytes = json.dumps(CONTAINER_KINDS, separators=(",", ":")).encode("utf-8")
+CONTAINER_KINDS_ETAG: str = f'"{hashlib.sha1(CONTAINER_KINDS_JSON).hexdigest()}"'
@@ -5,9 +5,10 @@ container, and can be customized to use different types of coordinate ranges.
 """
 
 
-import re
 import unicodedata
-from typing import Tuple, Union
+from functools import lru_cache
+from itertools import product
+from typing import Any, Dict, Iterable, List, Tuple, Union
 
 
 __all__ = [
@@ -19,8 +20,11 @@ __all__ = [
     "alphas",
     "ints",
 
+    "CoordinateValidator",
+    "get_coordinate_validator",
     "validate_and_normalize_coordinates",
     "check_coordinate_overlap",
+    "CoordinateOverlapIndex",
 ]
 
 
@@ -59,23 +63,60 @@ def ints(end: int, pad_to: int = 0) -> CoordinateAxis:
     return tuple(str(i).zfill(pad_to) for i in range(1, end + 1))
 
 
-def validate_and_normalize_coordinates(coords: str, spec: CoordinateSpec) -> str:
+class CoordinateValidator:
     """
-    Given a set of coordinates and a coordinate spec, validates if those
-    coordinates are valid by the spec.
+    Validates coordinates against a coordinate spec. The set of all valid
+    coordinate strings is computed once (at most a few hundred entries, e.g.
+    384 for a 384-well plate), making validation a set membership test.
     """
 
-    # TODO: Handle padded 0s?
+    def __init__(self, spec: CoordinateSpec):
+        self._valid_coordinates = frozenset("".join(c) for c in product(*spec))
+        # Kept for error messages; coordinate systems are described as regexes
+        self._spec_str = "^" + "".join(f"({'|'.join(s)})" for s in spec) + "$"
+
+    def validate(self, coords: str) -> str:
+        """
+        Validates a set of coordinates, returning their normalized form.
+        """
+
+        # TODO: Handle padded 0s?
+
+        c = unicodedata.normalize("NFC", coords.strip())
+
+        if c not in self._valid_coordinates:
+            raise CoordinateError(f"Invalid coordinates {c} specified for coordinate system {self._spec_str}")
+
+        return c
+
+    def validate_many(self, coords: Iterable[str]) -> List[str]:
+        """
+        Validates a sequence of coordinates (e.g. a whole template column) at
+        once, returning their normalized forms. Every invalid value is reported
+        in a single error.
+        """
+
+        normalized = [unicodedata.normalize("NFC", c.strip()) for c in coords]
+        invalid = [c for c in normalized if c not in self._valid_coordinates]
+
+        if invalid:
+            raise CoordinateError(f"Invalid coordinates {', '.join(invalid)} specified for coordinate system "
+                                  f"{self._spec_str}")
 
-    c = unicodedata.normalize("NFC", coords.strip())
+        return normalized
 
-    coordinate_regex_str = "^" + "".join(f"({'|'.join(s)})" for s in spec) + "$"
-    coordinate_regex = re.compile(coordinate_regex_str)
 
-    if not coordinate_regex.match(c):
-        raise CoordinateError(f"Invalid coordinates {c} specified for coordinate system {coordinate_regex_str}")
+@lru_cache(maxsize=None)
+def get_coordinate_validator(spec: CoordinateSpec) -> CoordinateValidator:
+    return CoordinateValidator(spec)
 
-    return c
+
+def validate_and_normalize_coordinates(coords: str, spec: CoordinateSpec) -> str:
+    """
+    Given a set of coordinates and a coordinate spec, validates if those
+    coordinates are valid by the spec.
+    """
+    return get_coordinate_validator(spec).validate(coords)
 
 
 def check_coordinate_overlap(queryset, obj, parent, obj_type: str = "container"):
@@ -87,3 +128,85 @@ def check_coordinate_overlap(queryset, obj, parent, obj_type: str = "container")
     existing = queryset.exclude(pk=obj.pk).get(coordinates=obj.coordinates)
     raise CoordinateError(f"Parent container {parent} already contains {obj_type} {existing} at "
                           f"coordinates {obj.coordinates}")
+
+
+class CoordinateOverlapIndex:
+    """
+    In-memory index of the coordinates occupied within parent containers, used
+    to validate many objects against each other and against the database
+    without running an overlap query for every object saved.
+
+    The occupants of a parent are loaded at most once, either up front with
+    preload() or lazily on the first check against that parent. Objects saved
+    afterwards must be recorded with add() so that later objects (e.g. other
+    rows of the same template) collide with them.
+    """
+
+    def __init__(self, model, parent_field: str, obj_type: str = "container"):
+        self._model = model
+        self._parent_field = parent_field
+        self._obj_type = obj_type
+
+        # parent pk -> {coordinates: occupant pk}
+        self._occupied: Dict[Any, Dict[str, Any]] = {}
+        # occupant pk -> (parent pk, coordinates), used to free positions on moves
+        self._positions: Dict[Any, Tuple[Any, str]] = {}
+
+    def preload(self, parent_pks: Iterable[Any]):
+        parent_pks = {pk for pk in parent_pks if pk is not None and pk not in self._occupied}
+        if not parent_pks:
+            return
+
+        for pk in parent_pks:
+            self._occupied[pk] = {}
+
+        occupants = self._model.objects.filter(**{f"{self._parent_field}__in": parent_pks}).values_list(
+            self._parent_field, "pk", "coordinates")
+        for parent_pk, obj_pk, coordinates in occupants:
+            self._reserve(parent_pk, obj_pk, coordinates)
+
+    def preload_empty(self, parent_pk):
+        """
+        Records a parent which is known to be empty, e.g. one which has not
+        been inserted yet, without querying for its occupants.
+        """
+        self._occupied.setdefault(parent_pk, {})
+
+    def _reserve(self, parent_pk, obj_pk, coordinates: str):
+        self._occupied[parent_pk][coordinates] = obj_pk
+        self._positions[obj_pk] = (parent_pk, coordinates)
+
+    def check(self, obj, parent):
+        """
+        Raises a CoordinateError if the coordinates of obj are already taken
+        within parent by another object.
+        """
+
+        if parent.pk is None:
+            # An unsaved parent cannot contain anything yet
+            return
+
+        self.preload((parent.pk,))
+
+        existing_pk = self._occupied[parent.pk].get(obj.coordinates)
+        if existing_pk is None or existing_pk == obj.pk:
+            return
+
+        existing = self._model.objects.get(pk=existing_pk)
+        raise CoordinateError(f"Parent container {parent} already contains {self._obj_type} {existing} at "
+                              f"coordinates {obj.coordinates}")
+
+    def add(self, obj, parent_pk):
+        """
+        Records the position of a saved object, freeing its previous position
+        if it has moved.
+        """
+
+        previous = self._positions.pop(obj.pk, None)
+        if previous is not None and self._occupied[previous[0]].get(previous[1]) == obj.pk:
+            del self._occupied[previous[0]][previous[1]]
+
+        # Parents which have not been loaded yet will pick the object up from
+        # the database if they are ever checked against.
+        if parent_pk in self._occupied:
+            self._reserve(parent_pk, obj.pk, obj.coordinates)
@@ -0,0 +1,346 @@
+"""
+Background processing of template imports. Submitted templates are saved to
+disk and queued as ImportJob records, which are picked up and imported by
+the process_import_jobs management command.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import reversion
+import tempfile
+import threading
+import time
+import traceback
+
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+from tablib import Dataset
+from typing import Optional, Tuple
+
+from . import resources
+from .caching import get_table_versions
+from .models import ImportedFile, ImportJob
+from .template_reader import read_template
+
+
+__all__ = [
+    "UPLOADS_PATH",
+    "serialize_import_result",
+    "load_template_dataset",
+    "save_template_file",
+    "check_template",
+    "get_checked_template",
+    "queue_import_job",
+    "queue_checked_import_job",
+    "claim_import_job",
+    "run_import_job",
+]
+
+
+UPLOADS_PATH = os.path.join(settings.MEDIA_ROOT, "uploads/")
+
+PROGRESS_INTERVAL = 1  # seconds
+
+# Running jobs whose worker has not reported being alive for this long are assumed to have died with their
+# worker, and are claimed again; their import transaction was rolled back along with the worker's connection.
+STALE_JOB_TIMEOUT = 5 * 60  # seconds
+
+# How long a checked template can be submitted for without being re-parsed
+TEMPLATE_CHECK_TIMEOUT = 60 * 60
+
+
+def _serialize_error(error) -> dict:
+    return {
+        "error": str(error.error),
+        "traceback": error.traceback if settings.DEBUG else "",
+    }
+
+
+def serialize_import_result(result) -> dict:
+    return {
+        "valid": not (result.has_errors() or result.has_validation_errors()),
+        "base_errors": [_serialize_error(e) for e in result.base_errors],
+        "rows": [{
+            "errors": [_serialize_error(e) for e in r.errors],
+            "validation_error": r.validation_error,
+            "diff": r.diff,
+            "import_type": r.import_type,
+        } for r in result.rows],
+    }
+
+
+def load_template_dataset(template_file, file_name: str, resource_class, max_rows: Optional[int] = None) -> Dataset:
+    # There are only two file types accepted; .xlsx and .csv. Rows are read
+    # one at a time, with the resource's template preamble skipped.
+    return read_template(template_file, file_name, preamble_rows=resource_class.template_preamble_rows,
+                         max_rows=max_rows)
+
+
+def save_template_file(template_file, user) -> ImportedFile:
+    """
+    Saves an uploaded template file to the uploads folder, along with a record
+    about the file.
+    """
+
+    file_name, ext = os.path.splitext(template_file.name)
+    new_file_name = f"{file_name}_{time.strftime('%Y%m%d-%H%M%S')}_{user.username}{ext}"
+    file_path = os.path.join(UPLOADS_PATH, new_file_name)
+
+    os.makedirs(UPLOADS_PATH, exist_ok=True)
+    with open(file_path, "wb") as f_output:
+        for chunk in template_file.chunks():
+            f_output.write(chunk)
+
+    return ImportedFile.objects.create(filename=new_file_name, location=file_path, imported_by=user)
+
+
+def _checked_template_key(token: str, user) -> str:
+    # Checks are only available to the user who ran them
+    return f"template_check:{user.pk}:{token}"
+
+
+def _save_checked_template_file(template_file, resource_class) -> Tuple[str, str]:
+    """
+    Saves a checked template file to the checks folder, hashing it as it is
+    written, and returns the resulting token along with the file path. Files
+    of checks which have expired are removed along the way.
+    """
+
+    checks_path = os.path.join(UPLOADS_PATH, "checks")
+    os.makedirs(checks_path, exist_ok=True)
+
+    expired = time.time() - TEMPLATE_CHECK_TIMEOUT
+    with os.scandir(checks_path) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.stat().st_mtime < expired:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:  # Removed by another process in the meantime
+                    pass
+
+    token_hash = hashlib.sha256(resource_class.__name__.encode("utf-8") + b"\0")
+
+    template_file.seek(0)
+    with tempfile.NamedTemporaryFile(dir=checks_path, delete=False) as f_output:
+        for chunk in template_file.chunks():
+            token_hash.update(chunk)
+            f_output.write(chunk)
+
+    token = token_hash.hexdigest()
+    file_path = os.path.join(checks_path, token + os.path.splitext(template_file.name)[1])
+    os.replace(f_output.name, file_path)
+
+    return token, file_path
+
+
+def check_template(template_file, resource_class, user, max_rows: Optional[int] = None) -> Tuple[str, dict]:
+    """
+    Imports a template in dry-run mode and returns a token for the check
+    along with its result. The parsed dataset and the lookups resolved by
+    the resource are cached under the token, which identifies the file
+    contents and resource, and the user, so that the user can submit the
+    template without it being parsed or resolved again.
+    """
+
+    dataset = load_template_dataset(template_file, template_file.name, resource_class, max_rows)
+
+    # Only save the file once it is known to be within the row limit
+    token, file_path = _save_checked_template_file(template_file, resource_class)
+
+    pickled_dataset = pickle.dumps(dataset)  # Before the import modifies the dataset in place
+
+    resource_instance = resource_class()
+
+    # Versions are read before the lookups are resolved; any later write to
+    # the tables involved invalidates the cached lookups.
+    lookup_versions = get_table_versions(resource_class.lookup_caches.values())
+
+    result = resource_instance.import_data(dataset, dry_run=True)
+
+    cache.set(_checked_template_key(token, user), {
+        "resource": resource_class.__name__,
+        "file_name": template_file.name,
+        "file_path": file_path,
+        "dataset": pickled_dataset,
+        "lookups": resource_instance.lookup_snapshot,
+        "lookup_versions": lookup_versions,
+    }, TEMPLATE_CHECK_TIMEOUT)
+
+    return token, serialize_import_result(result)
+
+
+def get_checked_template(token: str, resource_class, user) -> Optional[dict]:
+    """
+    Returns a user's cached check of a template for a resource, or None if
+    the check has expired. The cached lookups are only returned as long as
+    none of the tables they were resolved from has been written to since.
+    """
+
+    if user is None:
+        return None
+
+    checked = cache.get(_checked_template_key(token, user))
+    if checked is None or checked["resource"] != resource_class.__name__:
+        return None
+
+    lookups_valid = (
+        checked["lookups"] is not None and
+        get_table_versions(resource_class.lookup_caches.values()) == checked["lookup_versions"]
+    )
+
+    return {
+        "file_name": checked["file_name"],
+        "dataset": pickle.loads(checked["dataset"]),
+        "lookups": pickle.loads(checked["lookups"]) if lookups_valid else None,
+    }
+
+
+def queue_import_job(template_file, resource_class, user, max_rows: Optional[int] = None,
+                     check_token: str = "") -> ImportJob:
+    return ImportJob.objects.create(
+        imported_file=save_template_file(template_file, user),
+        resource=resource_class.__name__,
+        max_rows=max_rows,
+        check_token=check_token,
+        created_by=user,
+    )
+
+
+def queue_checked_import_job(token: str, resource_class, user, max_rows: Optional[int] = None) \
+        -> Optional[ImportJob]:
+    """
+    Queues the import of a previously checked template, without it having to
+    be uploaded again. Returns None if the check has expired.
+    """
+
+    checked = cache.get(_checked_template_key(token, user))
+    if checked is None or checked["resource"] != resource_class.__name__:
+        return None
+
+    try:
+        with open(checked["file_path"], "rb") as template_file:
+            return queue_import_job(File(template_file, name=checked["file_name"]), resource_class, user,
+                                    max_rows=max_rows, check_token=token)
+    except FileNotFoundError:  # Removed along with other expired checks
+        return None
+
+
+def claim_import_job() -> Optional[ImportJob]:
+    """
+    Marks the oldest queued job, or running job whose worker has stopped
+    reporting, as running and returns it, or returns None if there is no such
+    job. Jobs locked by another worker are skipped.
+    """
+
+    now = timezone.now()
+    stale = now - timedelta(seconds=STALE_JOB_TIMEOUT)
+
+    with transaction.atomic():
+        job = ImportJob.objects.select_for_update(skip_locked=True).filter(
+            Q(status=ImportJob.STATUS_QUEUED) | Q(status=ImportJob.STATUS_RUNNING, heartbeat__lt=stale)
+        ).order_by("id").first()
+
+        if job is None:
+            return None
+
+        job.status = ImportJob.STATUS_RUNNING
+        job.started = now
+        job.heartbeat = now
+        job.processed_rows = 0
+        job.save(update_fields=("status", "started", "heartbeat", "processed_rows"))
+
+    return job
+
+
+class _ProgressReporter(threading.Thread):
+    """
+    Periodically writes the progress of an import job, along with a heartbeat,
+    to the database. Runs in its own thread, and therefore uses its own
+    database connection, so that progress is visible while the import
+    transaction is still open.
+    """
+
+    def __init__(self, job_id: int):
+        super().__init__(daemon=True)
+        self.job_id = job_id
+        self.processed_rows = 0
+        self.total_rows = None
+        self._stop_event = threading.Event()
+
+    def update(self, processed_rows: int, total_rows: int):
+        self.processed_rows = processed_rows
+        self.total_rows = total_rows
+
+    def run(self):
+        try:
+            while not self._stop_event.wait(PROGRESS_INTERVAL):
+                progress = (self.processed_rows, self.total_rows)
+                ImportJob.objects.filter(pk=self.job_id).update(processed_rows=progress[0], total_rows=progress[1],
+                                                                heartbeat=timezone.now())
+        finally:
+            connection.close()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def run_import_job(job: ImportJob):
+    """
+    Imports a claimed job's template file and records the result. Nothing is
+    saved unless every row imports successfully.
+    """
+
+    reporter = _ProgressReporter(job.pk)
+    reporter.start()
+
+    try:
+        resource_class = getattr(resources, job.resource)
+        resource_instance = resource_class()
+        resource_instance.progress_callback = reporter.update
+
+        checked = get_checked_template(job.check_token, resource_class, job.created_by) if job.check_token else None
+
+        if checked is not None:
+            # Re-use what was parsed and resolved when the template was checked
+            dataset = checked["dataset"]
+            resource_instance.preloaded_lookups = checked["lookups"]
+        else:
+            with open(job.imported_file.location, "rb") as f:
+                dataset = load_template_dataset(f, job.imported_file.filename, resource_class, job.max_rows)
+
+        with transaction.atomic():
+            with reversion.create_revision():
+                if job.created_by is not None:
+                    reversion.set_user(job.created_by)
+                result = resource_instance.import_data(dataset)
+
+            # Encode the result as the API would, e.g. for validation errors
+            job.result = json.loads(json.dumps(serialize_import_result(result), cls=JSONEncoder))
+            if not job.result["valid"]:
+                # Validation errors do not roll the import back by themselves
+                transaction.set_rollback(True)
+
+    except Exception as e:
+        job.result = {
+            "valid": False,
+            "base_errors": [{"error": str(e), "traceback": traceback.format_exc() if settings.DEBUG else ""}],
+            "rows": [],
+        }
+
+    finally:
+        reporter.stop()
+
+    job.status = ImportJob.STATUS_SUCCEEDED if job.result["valid"] else ImportJob.STATUS_FAILED
+    job.processed_rows = reporter.processed_rows
+    job.total_rows = reporter.total_rows
+    job.finished = timezone.now()
+    job.save(update_fields=("status", "processed_rows", "total_rows", "result", "finished"))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from reversion.models import Version
+
+from ...change_log import get_field_changes, with_previous_serialized_data
+from ...models import FieldChange
+
+
+class Command(BaseCommand):
+    help = "Logs the field changes of versions saved before the change log was introduced"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000,
+                            help="number of versions processed per transaction")
+        parser.add_argument("--since-pk", type=int, default=0,
+                            help="only process versions with a greater ID, e.g. the last version ID reported by an "
+                                 "interrupted run")
+
+    def handle(self, *args, **options):
+        # Versions saved from now on are logged as they are saved. Versions which already have changes logged are
+        # skipped, but versions without any change cannot be told apart from unprocessed ones; interrupted runs are
+        # resumed with --since-pk instead of diffing every such version again.
+        last_pk = options["since_pk"]
+        max_pk = Version.objects.order_by("-pk").values_list("pk", flat=True).first() or 0
+
+        versions = with_previous_serialized_data(
+            Version.objects.filter(field_changes__isnull=True, pk__lte=max_pk).select_related("revision")
+        ).order_by("pk")
+
+        total_versions = 0
+        total_changes = 0
+
+        while True:
+            batch = list(versions.filter(pk__gt=last_pk)[:options["batch_size"]])
+            if not batch:
+                break
+
+            with transaction.atomic():
+                changes = [c for v in batch for c in get_field_changes(v, v.previous_serialized_data)]
+                FieldChange.objects.bulk_create(changes)
+
+            last_pk = batch[-1].pk
+            total_versions += len(batch)
+            total_changes += len(changes)
+            self.stdout.write(f"Processed {total_versions} versions, up to version {last_pk}")
+
+        self.stdout.write(self.style.SUCCESS(f"Logged {total_changes} field changes from {total_versions} versions."))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ...jobs import claim_import_job, run_import_job
+
+
+class Command(BaseCommand):
+    help = "Processes queued template import jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true",
+                            help="exit once no job is left in the queue, instead of waiting for new jobs")
+        parser.add_argument("--poll-interval", type=float, default=2.0,
+                            help="seconds to wait between checks for new jobs when the queue is empty")
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS("Processing import jobs."))
+
+        while True:
+            job = claim_import_job()
+
+            if job is None:
+                if options["once"]:
+                    break
+                time.sleep(options["poll_interval"])
+                continue
+
+            self.stdout.write(f"Running {job}")
+            run_import_job(job)
+            self.stdout.write(f"Finished {job}")
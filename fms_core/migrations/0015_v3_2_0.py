@@ -0,0 +1,134 @@
+from decimal import Decimal
+from django.conf import settings
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Computes every container's materialized path of ancestor IDs in one pass over the hierarchy
+BACKFILL_CONTAINER_PATHS = """
+WITH RECURSIVE container_paths(id, path) AS (
+    SELECT id, '/' FROM fms_core_container WHERE location_id IS NULL
+  UNION ALL
+    SELECT c.id, p.path || p.id || '/'
+    FROM fms_core_container c JOIN container_paths p ON c.location_id = p.id
+)
+UPDATE fms_core_container SET path = container_paths.path
+FROM container_paths
+WHERE fms_core_container.id = container_paths.id;
+"""
+
+
+# Trigram indexes for substring searches. These index the same expression Django generates for icontains lookups,
+# UPPER(column::text), so that those lookups can use them.
+TRIGRAM_INDEXED_COLUMNS = (
+    ("fms_core_container", "name"),
+    ("fms_core_individual", "name"),
+    ("fms_core_sample", "name"),
+    ("fms_core_sample", "alias"),
+    ("auth_user", "username"),
+    ("auth_user", "first_name"),
+    ("auth_user", "last_name"),
+)
+
+
+# Sets every sample's current volume from the latest entry of its volume history
+BACKFILL_SAMPLE_CURRENT_VOLUMES = """
+UPDATE fms_core_sample SET current_volume = COALESCE((volume_history->-1->>'volume_value')::numeric, 0);
+"""
+
+
+def trigram_index_operation(table, column):
+    index_name = f"{table}_{column}_trgm_idx"
+    return migrations.RunSQL(
+        f"CREATE INDEX {index_name} ON {table} USING gin ((UPPER({column}::text)) gin_trgm_ops);",
+        f"DROP INDEX IF EXISTS {index_name};"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('reversion', '0001_squashed_0004_auto_20160611_1202'),
+        ('fms_core', '0014_v3_1_0'),
+    ]
+
+    operations = [
+        # Materialized container paths, used for subtree queries
+        migrations.AddField(
+            model_name='container',
+            name='path',
+            field=models.TextField(blank=True, default='', editable=False, help_text='Path of ancestor container IDs, from the root to the parent container.'),
+        ),
+        migrations.RunSQL(
+            BACKFILL_CONTAINER_PATHS,
+            migrations.RunSQL.noop
+        ),
+        migrations.AddIndex(
+            model_name='container',
+            index=models.Index(fields=['path'], name='fms_core_container_path_idx', opclasses=['text_pattern_ops']),
+        ),
+
+        # Trigram indexes for searches
+        TrigramExtension(),
+        *(trigram_index_operation(table, column) for table, column in TRIGRAM_INDEXED_COLUMNS),
+
+        # Background template imports
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(help_text='Name of the resource used to import the template.', max_length=100)),
+                ('max_rows', models.PositiveIntegerField(blank=True, help_text='Maximum number of data rows allowed in the template.', null=True)),
+                ('check_token', models.CharField(blank=True, help_text='Token of the check of the template, if it was checked beforehand.', max_length=64)),
+                ('status', models.CharField(choices=[('queued', 'queued'), ('running', 'running'), ('succeeded', 'succeeded'), ('failed', 'failed')], db_index=True, default='queued', help_text='Current status of the import job.', max_length=20)),
+                ('total_rows', models.PositiveIntegerField(blank=True, help_text='Number of data rows in the template, once known.', null=True)),
+                ('processed_rows', models.PositiveIntegerField(default=0, help_text='Number of data rows processed so far.')),
+                ('result', models.JSONField(blank=True, help_text='Result of the import, including any per-row errors.', null=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('started', models.DateTimeField(blank=True, null=True)),
+                ('finished', models.DateTimeField(blank=True, null=True)),
+                ('heartbeat', models.DateTimeField(blank=True, help_text='Last time the worker running the job reported being alive.', null=True)),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='import_jobs', to=settings.AUTH_USER_MODEL)),
+                ('imported_file', models.ForeignKey(help_text='Submitted template file to import.', on_delete=django.db.models.deletion.PROTECT, related_name='import_jobs', to='fms_core.importedfile')),
+            ],
+        ),
+
+        # Field-level change log of versions; changes of existing versions are logged by the backfill_field_changes
+        # management command
+        migrations.CreateModel(
+            name='FieldChange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.CharField(help_text='Primary key of the changed object.', max_length=191)),
+                ('date', models.DateTimeField(help_text='Date and time of the revision.')),
+                ('field', models.CharField(help_text='Name of the changed field.', max_length=100)),
+                ('old_value', models.JSONField(blank=True, help_text='Serialized value of the field before the change.', null=True)),
+                ('new_value', models.JSONField(blank=True, help_text='Serialized value of the field after the change.', null=True)),
+                ('content_type', models.ForeignKey(help_text='Content type of the changed object.', on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+                ('revision', models.ForeignKey(help_text='Revision in which the field was changed.', on_delete=django.db.models.deletion.CASCADE, related_name='field_changes', to='reversion.revision')),
+                ('version', models.ForeignKey(help_text='Version in which the field was changed.', on_delete=django.db.models.deletion.CASCADE, related_name='field_changes', to='reversion.version')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='fieldchange',
+            index=models.Index(fields=['content_type', 'object_id', 'date'], name='fms_core_fieldchange_obj_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fieldchange',
+            index=models.Index(fields=['content_type', 'field', 'date'], name='fms_core_fieldchange_field_idx'),
+        ),
+
+        # Current sample volumes, projected from the volume histories for filtering, sorting and aggregation
+        migrations.AddField(
+            model_name='sample',
+            name='current_volume',
+            field=models.DecimalField(db_index=True, decimal_places=3, default=Decimal('0'), editable=False, help_text='Current volume of the sample in µL, from its volume history.', max_digits=20, verbose_name='current volume in µL'),
+        ),
+        migrations.RunSQL(
+            BACKFILL_SAMPLE_CURRENT_VOLUMES,
+            migrations.RunSQL.noop
+        ),
+    ]
@@ -2,7 +2,9 @@ from .container import Container
 from .container_move import ContainerMove
 from .container_rename import ContainerRename
 from .extracted_sample import ExtractedSample
+from .field_change import FieldChange
 from .imported_file import ImportedFile
+from .import_job import ImportJob
 from .individual import Individual
 from .sample import Sample
 from .sample_kind import SampleKind
@@ -16,7 +18,9 @@ __all__ = [
     "ContainerMove",
     "ContainerRename",
     "ExtractedSample",
+    "FieldChange",
     "ImportedFile",
+    "ImportJob",
     "Individual",
     "Sample",
     "SampleKind",
@@ -0,0 +1,96 @@
+import threading
+
+from collections import defaultdict
+from contextlib import contextmanager
+from django.db.models import Model
+from typing import Any, Dict, Iterable, Optional, Type
+
+from ..coordinates import CoordinateOverlapIndex
+
+
+__all__ = [
+    "ValidationContext",
+    "fill_related",
+    "get_validation_context",
+    "validation_context",
+]
+
+
+_local = threading.local()
+
+
+class ValidationContext:
+    """
+    Shared state for validating many model instances in a row, e.g. during a
+    template import. Model clean() methods use it, when one is active, instead
+    of querying the database for every instance.
+    """
+
+    def __init__(self):
+        self._overlap_indices = {}
+        # model -> {pk: instance}, for filling in related objects of validated instances
+        self._objects: Dict[Type[Model], Dict[Any, Model]] = defaultdict(dict)
+
+    def overlap_index(self, model, parent_field: str, obj_type: str = "container") -> CoordinateOverlapIndex:
+        key = (model, parent_field)
+        if key not in self._overlap_indices:
+            self._overlap_indices[key] = CoordinateOverlapIndex(model, parent_field, obj_type)
+        return self._overlap_indices[key]
+
+    def add_objects(self, objs: Iterable[Model]):
+        """
+        Makes already loaded objects available as the related objects of the
+        instances being validated; see fill_related.
+        """
+
+        for obj in objs:
+            self._objects[obj.__class__][obj.pk] = obj
+
+    def get_object(self, model: Type[Model], pk) -> Optional[Model]:
+        return self._objects[model].get(pk)
+
+
+def fill_related(obj: Model, *fields: str):
+    """
+    Sets the specified foreign key fields of an instance to the objects added
+    to the active validation context, if any, so that accessing them does not
+    run a query. Related objects which are already loaded are left as is.
+    """
+
+    context = get_validation_context()
+    if context is None:
+        return
+
+    for name in fields:
+        field = obj._meta.get_field(name)
+        pk = getattr(obj, field.attname)
+        if pk is None or field.is_cached(obj):
+            continue
+
+        related = context.get_object(field.related_model, pk)
+        if related is not None:
+            field.set_cached_value(obj, related)
+
+
+def get_validation_context() -> Optional[ValidationContext]:
+    return getattr(_local, "context", None)
+
+
+@contextmanager
+def validation_context():
+    """
+    Activates a validation context for the current thread. Nested uses re-use
+    the outermost context.
+    """
+
+    context = get_validation_context()
+    if context is not None:
+        yield context
+        return
+
+    context = ValidationContext()
+    _local.context = context
+    try:
+        yield context
+    finally:
+        _local.context = None
@@ -2,6 +2,9 @@ import reversion
 
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Concat, Substr
+from typing import Dict, Iterable, List
 
 from ..containers import (
     CONTAINER_KIND_SPECS,
@@ -13,13 +16,19 @@ from ..utils import str_cast_and_normalize
 
 from ._constants import BARCODE_NAME_FIELD_LENGTH
 from ._utils import add_error as _add_error
+from ._validation import fill_related, get_validation_context
 from ._validators import name_validator, container_barcode_validator
 
 
 __all__ = ["Container"]
 
 
-@reversion.register()
+# Guards recursive hierarchy queries against runaway recursion, in case a cycle is ever introduced in the data.
+MAX_CONTAINER_DEPTH = 64
+
+
+# The materialized path is derived from the hierarchy; reverting it along with a version would leave it stale.
+@reversion.register(exclude=("path",))
 class Container(models.Model):
     """ Class to store information about a sample. """
 
@@ -50,9 +59,65 @@ class Container(models.Model):
     update_comment = models.TextField(blank=True, help_text="Comment describing the latest updates made to the "
                                                             "container. Change this whenever updates are made.")
 
+    # Materialized path of ancestor IDs, e.g. /1/5/ for a container located in container 5, itself located in
+    # container 1. Maintained on save; allows querying whole subtrees with a single indexed prefix match.
+    path = models.TextField(blank=True, default="", editable=False,
+                            help_text="Path of ancestor container IDs, from the root to the parent container.")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["path"], name="fms_core_container_path_idx", opclasses=["text_pattern_ops"]),
+        ]
+
     def __str__(self):
         return self.barcode
 
+    @property
+    def subtree_path(self) -> str:
+        """
+        Path prefix shared by every container nested (at any depth) within
+        this container.
+        """
+        return f"{self.path}{self.pk}/"
+
+    def compute_path(self) -> str:
+        return "/" if self.location is None else self.location.subtree_path
+
+    @classmethod
+    def get_ancestors(cls, container_ids: Iterable[int]) -> Dict[int, List["Container"]]:
+        """
+        Returns, for each of the specified container IDs, the list of its
+        ancestors in order from closest-to-root to the direct parent. All
+        ancestries are computed with a single recursive query.
+        """
+
+        container_ids = list(set(container_ids))
+        ancestors = {container_id: [] for container_id in container_ids}
+
+        if not container_ids:
+            return ancestors
+
+        table = cls._meta.db_table
+        query = f"""
+            WITH RECURSIVE ancestry(descendant_id, ancestor_id, depth) AS (
+                SELECT id, location_id, 1 FROM {table}
+                WHERE id = ANY(%s) AND location_id IS NOT NULL
+              UNION ALL
+                SELECT a.descendant_id, c.location_id, a.depth + 1
+                FROM ancestry a JOIN {table} c ON c.id = a.ancestor_id
+                WHERE c.location_id IS NOT NULL AND a.depth < %s
+            )
+            SELECT c.*, a.descendant_id FROM ancestry a JOIN {table} c ON c.id = a.ancestor_id
+            ORDER BY a.descendant_id, a.depth DESC
+        """
+
+        # Share instances between ancestries, so that each container is only loaded / prefetched once
+        containers = {}
+        for container in cls.objects.raw(query, [container_ids, MAX_CONTAINER_DEPTH]):
+            ancestors[container.descendant_id].append(containers.setdefault(container.pk, container))
+
+        return ancestors
+
     def normalize(self):
         # Normalize any string values to make searching / data manipulation easier
         self.kind = str_cast_and_normalize(self.kind).lower()
@@ -69,6 +134,7 @@ class Container(models.Model):
             _add_error(errors, field, ValidationError(error))
 
         self.normalize()
+        fill_related(self, "location")
 
         if check_regexes:
             container_barcode_validator(self.barcode)
@@ -81,6 +147,9 @@ class Container(models.Model):
             if self.location.barcode == self.barcode:
                 add_error("location", "Container cannot contain itself")
 
+            elif self.pk is not None and self.location.path.startswith(self.subtree_path):
+                add_error("location", "Container cannot be located inside one of its own descendants")
+
             else:
                 parent_spec = CONTAINER_KIND_SPECS[self.location.kind]
 
@@ -102,7 +171,11 @@ class Container(models.Model):
                         and not parent_spec.coordinate_overlap_allowed:
                     # Check for coordinate overlap with existing child containers of the parent
                     try:
-                        check_coordinate_overlap(self.location.children, self, self.location)
+                        context = get_validation_context()
+                        if context is not None:
+                            context.overlap_index(Container, "location").check(self, self.location)
+                        else:
+                            check_coordinate_overlap(self.location.children, self, self.location)
                     except CoordinateError as e:
                         add_error("coordinates", str(e))
                     except Container.DoesNotExist:
@@ -116,4 +189,20 @@ class Container(models.Model):
         # Normalize and validate before saving, always!
         self.normalize()
         self.full_clean()
+
+        # Keep the materialized path up to date; if the container has moved, re-root every descendant's path at once.
+        path = self.compute_path()
+        old_subtree_path = self.subtree_path if self.pk is not None and path != self.path else None
+        self.path = path
+
         super().save(*args, **kwargs)  # Save the object
+
+        if old_subtree_path is not None:
+            Container.objects.filter(path__startswith=old_subtree_path).update(path=Concat(
+                Value(self.subtree_path, output_field=models.TextField()),
+                Substr("path", len(old_subtree_path) + 1),
+            ))
+
+        context = get_validation_context()
+        if context is not None:
+            context.overlap_index(Container, "location").add(self, self.location_id)
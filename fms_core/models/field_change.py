@@ -0,0 +1,35 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+from reversion.models import Revision, Version
+
+__all__ = ["FieldChange"]
+
+
+class FieldChange(models.Model):
+    """
+    Model to log a change made to a field of a versioned object, as found
+    between the object's version and its previous version. The object and
+    revision date are copied from the version for indexed lookups.
+    """
+
+    version = models.ForeignKey(Version, on_delete=models.CASCADE, related_name="field_changes",
+                                help_text="Version in which the field was changed.")
+    revision = models.ForeignKey(Revision, on_delete=models.CASCADE, related_name="field_changes",
+                                 help_text="Revision in which the field was changed.")
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE,
+                                     help_text="Content type of the changed object.")
+    object_id = models.CharField(max_length=191, help_text="Primary key of the changed object.")
+    date = models.DateTimeField(help_text="Date and time of the revision.")
+
+    field = models.CharField(max_length=100, help_text="Name of the changed field.")
+    old_value = models.JSONField(null=True, blank=True, help_text="Serialized value of the field before the change.")
+    new_value = models.JSONField(null=True, blank=True, help_text="Serialized value of the field after the change.")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["content_type", "object_id", "date"], name="fms_core_fieldchange_obj_idx"),
+            models.Index(fields=["content_type", "field", "date"], name="fms_core_fieldchange_field_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.field} of {self.content_type.model} {self.object_id} (revision {self.revision_id})"
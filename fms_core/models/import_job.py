@@ -0,0 +1,48 @@
+from django.contrib.auth.models import User
+from django.db import models
+
+from .imported_file import ImportedFile
+
+__all__ = ["ImportJob"]
+
+
+class ImportJob(models.Model):
+    """ Model to track the background import of a submitted template file. """
+
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_SUCCEEDED = "succeeded"
+    STATUS_FAILED = "failed"
+
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, STATUS_QUEUED),
+        (STATUS_RUNNING, STATUS_RUNNING),
+        (STATUS_SUCCEEDED, STATUS_SUCCEEDED),
+        (STATUS_FAILED, STATUS_FAILED),
+    )
+
+    imported_file = models.ForeignKey(ImportedFile, on_delete=models.PROTECT, related_name="import_jobs",
+                                      help_text="Submitted template file to import.")
+    resource = models.CharField(max_length=100, help_text="Name of the resource used to import the template.")
+    max_rows = models.PositiveIntegerField(null=True, blank=True,
+                                           help_text="Maximum number of data rows allowed in the template.")
+    check_token = models.CharField(max_length=64, blank=True,
+                                   help_text="Token of the check of the template, if it was checked beforehand.")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED, db_index=True,
+                              help_text="Current status of the import job.")
+
+    total_rows = models.PositiveIntegerField(null=True, blank=True,
+                                             help_text="Number of data rows in the template, once known.")
+    processed_rows = models.PositiveIntegerField(default=0, help_text="Number of data rows processed so far.")
+    result = models.JSONField(null=True, blank=True,
+                              help_text="Result of the import, including any per-row errors.")
+
+    created_by = models.ForeignKey(User, null=True, on_delete=models.SET_NULL, related_name="import_jobs")
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+    heartbeat = models.DateTimeField(null=True, blank=True,
+                                     help_text="Last time the worker running the job reported being alive.")
+
+    def __str__(self):
+        return f"{self.resource} import #{self.id} ({self.status})"
@@ -22,6 +22,7 @@ from .sample_kind import SampleKind
 
 from ._constants import BARCODE_NAME_FIELD_LENGTH
 from ._utils import add_error as _add_error
+from ._validation import fill_related, get_validation_context
 from ._validators import name_validator
 
 __all__ = ["Sample"]
@@ -111,6 +112,11 @@ class Sample(models.Model):
                                                                                      "with the sample.")
     volume_history = models.JSONField("volume history in µL", validators=[VOLUME_VALIDATOR],
                                       help_text="Volume of the sample in µL.")
+    # Latest volume of the volume history, kept up to date by clean() so that it can be filtered, sorted and
+    # aggregated in SQL.
+    current_volume = models.DecimalField("current volume in µL", max_digits=20, decimal_places=3,
+                                         default=Decimal("0"), editable=False, db_index=True,
+                                         help_text="Current volume of the sample in µL, from its volume history.")
 
     # Concentration is REQUIRED if sample kind name in {DNA, RNA}.
     concentration = models.DecimalField(
@@ -254,6 +260,13 @@ class Sample(models.Model):
             _add_error(errors, field, ValidationError(error))
 
         self.normalize()
+        self.current_volume = self.volume
+
+        fill_related(self, "sample_kind", "extracted_from", "container")
+        if self.extracted_from is not None:
+            fill_related(self.extracted_from, "sample_kind")
+        if self.container_id is not None:
+            fill_related(self.container, "location")
 
         sample_kind_choices = (Sample.BIOSPECIMEN_TYPE_NA_CHOICES if self.extracted_from
                                     else Sample.BIOSPECIMEN_TYPE_CHOICES)
@@ -317,7 +330,7 @@ class Sample(models.Model):
 
             #  - Currently, extractions can only output tubes in a TUBE_RACK_8X12
             #    Only run this check when the object is first created - it can be updated later if it's moved elsewhere.
-            if not Sample.objects.filter(id=self.id).exists() and self.extracted_from is not None and any((
+            if self._state.adding and self.extracted_from is not None and any((
                     parent_spec != CONTAINER_SPEC_TUBE,
                     self.container.location is None,
                     CONTAINER_KIND_SPECS[self.container.location.kind] != CONTAINER_SPEC_TUBE_RACK_8X12
@@ -331,11 +344,15 @@ class Sample(models.Model):
                 except CoordinateError as e:
                     add_error("container", str(e))
 
-            # TODO: This isn't performant for bulk ingestion
             # - Check for coordinate overlap with existing child containers of the parent
+            #   When validating in bulk (e.g. template imports), occupied coordinates are checked in memory.
             if not errors.get("container") and not parent_spec.coordinate_overlap_allowed:
                 try:
-                    check_coordinate_overlap(self.container.samples, self, self.container, obj_type="sample")
+                    context = get_validation_context()
+                    if context is not None:
+                        context.overlap_index(Sample, "container", "sample").check(self, self.container)
+                    else:
+                        check_coordinate_overlap(self.container.samples, self, self.container, obj_type="sample")
                 except CoordinateError as e:
                     add_error("container", str(e))
                 except Sample.DoesNotExist:
@@ -350,3 +367,7 @@ class Sample(models.Model):
         self.normalize()
         self.full_clean()
         super().save(*args, **kwargs)  # Save the object
+
+        context = get_validation_context()
+        if context is not None:
+            context.overlap_index(Sample, "container", "sample").add(self, self.container_id)
@@ -0,0 +1,274 @@
+import base64
+import datetime
+import json
+
+from collections import OrderedDict
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import F, Q, QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from typing import Any, List, Optional, Sequence, Tuple
+
+
+__all__ = [
+    "estimate_count",
+    "EstimatedCountPagination",
+    "KeysetPagination",
+]
+
+
+def estimate_count(queryset: QuerySet) -> int:
+    """
+    Returns the planner's estimate of the number of rows of a queryset: the
+    table statistics for unfiltered querysets, and the row estimate of its
+    query plan otherwise. Estimates are only as good as the statistics kept
+    up to date by autovacuum/ANALYZE.
+    """
+
+    query = queryset.query
+    connection = connections[queryset.db]
+
+    with connection.cursor() as cursor:
+        if not query.where and not query.distinct and not query.combinator and query.low_mark == 0 \
+                and query.high_mark is None:
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                           [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+            if row is not None and row[0] >= 0:  # -1 if the table was never analyzed
+                return row[0]
+
+        sql, params = queryset.order_by().query.get_compiler(using=queryset.db).as_sql()
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class _CursorEncoder(DjangoJSONEncoder):
+    # Unlike DjangoJSONEncoder, keeps the microseconds of times, so that rows
+    # ordered by time are not skipped or repeated across pages.
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+# (lookup, descending) for each sort key, the last of which is unique
+SortKeys = List[Tuple[str, bool]]
+
+
+def _get_sort_keys(queryset: QuerySet) -> Optional[SortKeys]:
+    """
+    Returns the sort keys of an ordered queryset, ending with the primary key
+    as a tie-breaker, or None if the ordering cannot be used for keyset
+    pagination (e.g. random or expression-based ordering.)
+    """
+
+    query = queryset.query
+    ordering = query.order_by or (query.get_meta().ordering if query.default_ordering else ())
+
+    keys = []
+    for o in ordering:
+        if not isinstance(o, str) or o == "?":
+            return None
+
+        lookup = o.lstrip("-")
+        keys.append(("pk" if lookup == "id" else lookup, o.startswith("-")))
+        if keys[-1][0] == "pk":
+            # Anything after a unique key is irrelevant
+            return keys
+
+    return [*keys, ("pk", False)]
+
+
+def _key_after(lookup: str, descending: bool, value: Any) -> Optional[Q]:
+    # Follows Postgres' default null ordering: nulls come last in ascending order, first in descending order
+    if value is None:
+        return Q(**{f"{lookup}__isnull": False}) if descending else None
+    if descending:
+        return Q(**{f"{lookup}__lt": value})
+    if lookup == "pk":
+        return Q(pk__gt=value)
+    return Q(**{f"{lookup}__gt": value}) | Q(**{f"{lookup}__isnull": True})
+
+
+def _key_equal(lookup: str, value: Any) -> Q:
+    return Q(**{f"{lookup}__isnull": True}) if value is None else Q(**{lookup: value})
+
+
+def _rows_after(keys: SortKeys, values: Sequence[Any]) -> Q:
+    """
+    Builds the condition for rows which come after the specified sort key
+    values, i.e. (k1 > v1) OR (k1 = v1 AND ((k2 > v2) OR ...)).
+    """
+
+    (lookup, descending), *other_keys = keys
+    after = _key_after(lookup, descending, values[0])
+
+    if not other_keys:
+        # The last key is the primary key, which is never null
+        return after
+
+    condition = _key_equal(lookup, values[0]) & _rows_after(other_keys, values[1:])
+    return condition if after is None else after | condition
+
+
+class EstimatedCountPagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination which avoids counting large result sets: when
+    there are more than settings.FMS_EXACT_COUNT_THRESHOLD rows, the
+    planner's estimate is returned as the count instead of running a
+    COUNT(*) with every filter join. Responses tell which count was used
+    with the count_estimated field.
+
+    The page is fetched with one extra row, so that the next link does not
+    depend on the estimate. The count is known without any further query
+    once the last page is reached; otherwise rows are counted up to the
+    threshold, and the planner is only asked for an estimate past it.
+    """
+
+    count_estimated = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count_estimated = False
+
+        if not isinstance(queryset, QuerySet) or self.get_limit(request) is None:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.offset = self.get_offset(request)
+
+        page = list(queryset[self.offset:self.offset + self.limit + 1])
+
+        if len(page) <= self.limit and (page or self.offset == 0):
+            # Last page
+            self.count = self.offset + len(page)
+        else:
+            threshold = settings.FMS_EXACT_COUNT_THRESHOLD
+            self.count = queryset.order_by()[:threshold + 1].count()
+
+            if self.count > threshold:
+                # The estimate may be too low, but there are at least as many rows as were seen
+                self.count = max(estimate_count(queryset), self.count, self.offset + len(page))
+                self.count_estimated = True
+
+        if self.count > self.limit and self.template is not None:
+            self.display_page_controls = True
+
+        return page[:self.limit]
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ("count", self.count),
+            ("count_estimated", self.count_estimated),
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"]["count_estimated"] = {"type": "boolean", "example": False}
+        return response_schema
+
+
+class KeysetPagination(EstimatedCountPagination):
+    """
+    Pagination with estimated counts, with opt-in keyset pagination for
+    clients which walk through large result sets. When the request has a cursor parameter
+    (empty for the first page), rows are selected after the sort key values
+    of the previous page's last row, rather than by skipping over an offset,
+    so that deep pages cost as much as the first one. Pages are linked with
+    a next cursor only, and no count of the results is made.
+
+    The cursor follows the queryset's ordering (e.g. from OrderingFilter),
+    with the primary key as a tie-breaker.
+    """
+
+    cursor_query_param = "cursor"
+    cursor_query_description = "The pagination cursor value; empty for the first page."
+
+    keyset = False
+    next_cursor = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.cursor_query_param in request.query_params
+        sort_keys = _get_sort_keys(queryset) if self.keyset else None
+
+        if sort_keys is None:
+            self.keyset = False
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+
+        values = self.decode_cursor(request.query_params[self.cursor_query_param], len(sort_keys))
+        annotations = {f"_keyset_{i}": F(lookup) for i, (lookup, _) in enumerate(sort_keys)}
+
+        queryset = queryset.order_by(*(f"{'-' if d else ''}{lookup}" for lookup, d in sort_keys))
+        if values is not None:
+            queryset = queryset.filter(_rows_after(sort_keys, values))
+
+        page = list(queryset.annotate(**annotations)[:self.limit + 1])
+
+        self.next_cursor = None
+        if len(page) > self.limit:
+            page = page[:self.limit]
+            self.next_cursor = self.encode_cursor([getattr(page[-1], a) for a in annotations])
+
+        return page
+
+    @staticmethod
+    def encode_cursor(values: List[Any]) -> str:
+        return base64.urlsafe_b64encode(json.dumps(values, cls=_CursorEncoder).encode("utf-8")).decode("ascii")
+
+    def decode_cursor(self, cursor: str, num_keys: int) -> Optional[List[Any]]:
+        if not cursor:
+            return None
+
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        except (ValueError, UnicodeError):
+            raise NotFound("Invalid cursor")
+
+        if not isinstance(values, list) or len(values) != num_keys:
+            # e.g. the ordering was changed without restarting from the first page
+            raise NotFound("Invalid cursor")
+
+        return values
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+
+        return Response(OrderedDict([
+            ("next", self.get_next_link()),
+            ("results", data),
+        ]))
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+
+        if self.next_cursor is None:
+            return None
+
+        url = remove_query_param(self.request.build_absolute_uri(), self.offset_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_previous_link(self):
+        return None if self.keyset else super().get_previous_link()
+
+    def get_html_context(self):
+        if not self.keyset:
+            return super().get_html_context()
+        return {"previous_url": None, "next_url": self.get_next_link()}
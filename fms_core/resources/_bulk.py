@@ -0,0 +1,221 @@
+import reversion
+
+from collections import defaultdict
+from django.contrib.contenttypes.models import ContentType
+from django.core import serializers
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Model
+from django.utils.encoding import force_str
+from reversion.models import Revision, Version
+from reversion.revisions import _get_options as get_reversion_options
+from reversion.signals import post_revision_commit, pre_revision_commit
+from typing import Any, Dict, Iterable, List, Set, Tuple, Type
+
+from ..caching import schedule_table_version_bump
+
+
+__all__ = [
+    "BulkWriter",
+]
+
+
+class _IdAllocator:
+    """
+    Hands out primary keys for objects which have not been inserted yet, so
+    that they can be referenced by other objects, validated and indexed like
+    saved objects. Keys are reserved from the table's sequence as objects are
+    staged, in chunks which double in size up to MAX_CHUNK_SIZE, so that at
+    most as many keys are left unused as were handed out. On dry runs,
+    nothing is ever inserted, so temporary negative keys are used instead of
+    consuming the sequence.
+    """
+
+    MAX_CHUNK_SIZE = 128
+
+    def __init__(self, model: Type[Model], dry_run: bool):
+        self._model = model
+        self._chunk_size = 1
+        self._dry_run = dry_run
+        self._ids: List[int] = []
+        self._next_temporary_id = -1
+
+    def allocate(self) -> int:
+        if self._dry_run:
+            temporary_id = self._next_temporary_id
+            self._next_temporary_id -= 1
+            return temporary_id
+
+        if not self._ids:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)",
+                               [self._model._meta.db_table, self._model._meta.pk.column, self._chunk_size])
+                self._ids = [row[0] for row in reversed(cursor.fetchall())]
+            self._chunk_size = min(self._chunk_size * 2, self.MAX_CHUNK_SIZE)
+
+        return self._ids.pop()
+
+
+class BulkWriter:
+    """
+    Collects new objects over the course of a template import, validating
+    them in memory as they are staged, and inserts them with one bulk_create
+    per model once every row has been processed. The versions of the objects
+    are saved in bulk as well, under a single revision.
+
+    Changes to existing objects can be staged as well with stage_update();
+    they are saved with one bulk_update per model, and versioned along with
+    the new objects.
+
+    Staged objects are given their primary key right away, so later rows can
+    refer to them. Uniqueness is checked in memory, against the values staged
+    so far and the values existing in the database for fields registered
+    with preload_unique(); other unique fields are checked with a query.
+    """
+
+    def __init__(self, dry_run: bool):
+        self._dry_run = dry_run
+        self._allocators: Dict[Type[Model], _IdAllocator] = {}
+
+        # Staged objects by model, in the order models were first staged
+        self._staged: Dict[Type[Model], List[Model]] = {}
+        # Updated objects by model and primary key, along with the fields to update
+        self._updates: Dict[Type[Model], Tuple[Dict[Any, Model], Set[str]]] = {}
+        # (model, field name) -> values which are taken
+        self._unique_values: Dict[Tuple[Type[Model], str], Set[Any]] = defaultdict(set)
+        self._preloaded_unique: Set[Tuple[Type[Model], str]] = set()
+
+    @staticmethod
+    def clean(obj: Model, exclude: Iterable[str] = ()):
+        """
+        Validates an object without any query for uniqueness or for the
+        existence of related objects which are already loaded, since these
+        may only be staged.
+        """
+
+        loaded_relations = [
+            f.name for f in obj._meta.concrete_fields
+            if f.is_relation and f.is_cached(obj) and getattr(obj, f.name) is not None
+        ]
+        obj.full_clean(exclude=[*exclude, *loaded_relations], validate_unique=False)
+
+    def preload_unique(self, model: Type[Model], field: str, values: Iterable[Any]):
+        values = {v for v in values if v not in ("", None)}
+        self._unique_values[(model, field)].update(
+            model.objects.filter(**{f"{field}__in": values}).values_list(field, flat=True))
+        self._preloaded_unique.add((model, field))
+
+    def _check_unique(self, obj: Model, exclude: Iterable[str]):
+        model = obj.__class__
+        errors = {}
+
+        for field in model._meta.local_fields:
+            if not field.unique or field.primary_key or field.name in exclude:
+                continue
+
+            value = getattr(obj, field.attname)
+            if value is None:
+                continue
+
+            taken = self._unique_values[(model, field.name)]
+            if value in taken or ((model, field.name) not in self._preloaded_unique and
+                                  model.objects.filter(**{field.attname: value}).exists()):
+                errors[field.name] = [obj.unique_error_message(model, (field.name,))]
+
+        if errors:
+            raise ValidationError(errors)
+
+    def stage(self, obj: Model, validate: bool = True, unique_exclude: Iterable[str] = ()):
+        """
+        Validates a new object, without any uniqueness query for fields which
+        were preloaded, and assigns it a primary key. Fields in unique_exclude
+        are expected to have been checked by the caller.
+        """
+
+        model = obj.__class__
+
+        if validate:
+            self.clean(obj)
+        self._check_unique(obj, unique_exclude)
+
+        for field in model._meta.local_fields:
+            if field.unique and not field.primary_key:
+                self._unique_values[(model, field.name)].add(getattr(obj, field.attname))
+
+        if model not in self._allocators:
+            self._allocators[model] = _IdAllocator(model, self._dry_run)
+        obj.pk = self._allocators[model].allocate()
+
+        self._staged.setdefault(model, []).append(obj)
+
+    def stage_update(self, obj: Model, fields: Iterable[str]):
+        """
+        Records changes made to the specified fields of an existing object,
+        which is expected to be valid. An object may be staged more than once.
+        """
+
+        objs, update_fields = self._updates.setdefault(obj.__class__, ({}, set()))
+        objs[obj.pk] = obj
+        update_fields.update(fields)
+
+    def flush(self):
+        """
+        Inserts every staged object, saves staged updates, saves versions of
+        both if a revision is active, and bumps the versions of the tables
+        written to.
+        """
+
+        if self._dry_run:
+            return
+
+        staged = [(model, objs) for model, objs in self._staged.items() if objs]
+        updates = [(model, list(objs.values()), sorted(fields)) for model, (objs, fields) in self._updates.items()]
+        self._staged = {}
+        self._updates = {}
+
+        for model, objs in staged:
+            model.objects.bulk_create(objs)
+            schedule_table_version_bump(model)
+
+        for model, objs, fields in updates:
+            model.objects.bulk_update(objs, fields)
+            schedule_table_version_bump(model)
+
+        if reversion.is_active() and not reversion.is_manage_manually():
+            self._save_versions([
+                *(obj for _, objs in staged for obj in objs),
+                *(obj for _, objs, _ in updates for obj in objs),
+            ])
+
+    @staticmethod
+    def _save_versions(objs: List[Model]):
+        if not objs:
+            return
+
+        # Equivalent to what reversion does when a revision ends, with the versions inserted at once
+        versions = []
+        for obj in objs:
+            options = get_reversion_options(obj.__class__)
+            versions.append(Version(
+                content_type=ContentType.objects.get_for_model(obj.__class__),
+                object_id=force_str(obj.pk),
+                db=obj._state.db,
+                format=options.format,
+                serialized_data=serializers.serialize(options.format, (obj,), fields=options.fields),
+                object_repr=force_str(obj),
+            ))
+
+        revision = Revision(
+            date_created=reversion.get_date_created(),
+            user=reversion.get_user(),
+            comment=reversion.get_comment(),
+        )
+
+        pre_revision_commit.send(sender=reversion.create_revision, revision=revision, versions=versions)
+
+        revision.save()
+        for version in versions:
+            version.revision = revision
+        Version.objects.bulk_create(versions)
+
+        post_revision_commit.send(sender=reversion.create_revision, revision=revision, versions=versions)
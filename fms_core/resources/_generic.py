@@ -1,14 +1,96 @@
+import pickle
 import reversion
 
+from django.core.exceptions import ValidationError
 from import_export import resources
 from reversion.models import Version
+from ._bulk import BulkWriter
+from ..models._validation import validation_context
 
 
 class GenericResource(resources.ModelResource):
     clean_model_instances = True
     skip_unchanged = True
 
+    # Number of preamble rows before the header row of the resource's template
+    template_preamble_rows = 0
+
+    # Optional callable, called with (processed rows, total rows) after each
+    # row is imported; used to report the progress of background imports.
+    progress_callback = None
+
+    # Names of the LookupCache attributes set up by before_import, mapped to
+    # the model each one holds. Once resolved, lookups are snapshotted so that
+    # a checked template can be imported later without resolving them again.
+    lookup_caches = {}
+
+    # Lookups restored from a snapshot, used instead of resolving them again
+    preloaded_lookups = None
+    lookup_snapshot = None
+
+    # Whether new objects are validated in memory and inserted in bulk once
+    # every row has been processed, instead of being saved row by row. Set up
+    # by import_data; resources in bulk mode hand it to their lookup caches.
+    bulk_import = False
+    bulk_writer = None
+
+    def restore_lookups(self) -> bool:
+        if self.preloaded_lookups is None:
+            return False
+
+        for name in self.lookup_caches:
+            setattr(self, name, self.preloaded_lookups[name])
+        return True
+
+    def snapshot_lookups(self):
+        # Pickled right away, since the caches are filled with new objects
+        # over the course of the import. Pickled together so that instances
+        # shared between caches stay shared.
+        self.lookup_snapshot = pickle.dumps({name: getattr(self, name) for name in self.lookup_caches})
+
+    def import_data(self, dataset, dry_run=False, *args, **kwargs):
+        self._import_dataset = dataset
+        self._rows_processed = 0
+        self.bulk_writer = BulkWriter(dry_run=dry_run) if self.bulk_import else None
+
+        # Validate rows in bulk mode, so that e.g. coordinate overlaps are
+        # checked in memory against every row of the template.
+        with validation_context():
+            return super().import_data(dataset, dry_run, *args, **kwargs)
+
+    def import_row(self, *args, **kwargs):
+        row_result = super().import_row(*args, **kwargs)
+
+        self._rows_processed += 1
+        if self.progress_callback is not None:
+            # The dataset is modified in place by before_import, so its length is that of the data rows
+            self.progress_callback(self._rows_processed, len(self._import_dataset))
+
+        return row_result
+
+    def validate_instance(self, instance, import_validation_errors=None, validate_unique=True):
+        if self.bulk_writer is None:
+            super().validate_instance(instance, import_validation_errors, validate_unique)
+            return
+
+        # In bulk mode, uniqueness is checked in memory by the models and the
+        # bulk writer, and related objects may only be staged.
+        errors = dict(import_validation_errors or {})
+        try:
+            self.bulk_writer.clean(instance, exclude=errors.keys())
+        except ValidationError as e:
+            errors = e.update_error_dict(errors)
+
+        if errors:
+            raise ValidationError(errors)
+
     def save_instance(self, instance, using_transactions=True, dry_run=False):
+        if self.bulk_writer is not None and instance._state.adding:
+            self.before_save_instance(instance, using_transactions, dry_run)
+            self.bulk_writer.stage(instance, validate=False)  # Already validated by validate_instance
+            self.after_save_instance(instance, using_transactions, dry_run)
+            return
+
         if dry_run:
             with reversion.create_revision(manage_manually=True):
                 # Prevent reversion from saving on dry runs by manually overriding the current revision
@@ -19,5 +101,11 @@ class GenericResource(resources.ModelResource):
 
     def after_save_instance(self, instance, using_transactions, dry_run):
         if not dry_run:
-            versions = Version.objects.get_for_object(instance)
+            # Objects staged for bulk insertion are always new
+            versions = () if instance._state.adding else Version.objects.get_for_object(instance)
             reversion.set_comment("Updated from template." if len(versions) >= 1 else "Imported from template.")
+
+    def after_import(self, dataset, result, using_transactions, dry_run, **kwargs):
+        if self.bulk_writer is not None and not (result.has_errors() or result.has_validation_errors()):
+            self.bulk_writer.flush()
+        super().after_import(dataset, result, using_transactions, dry_run, **kwargs)
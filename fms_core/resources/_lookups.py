@@ -0,0 +1,135 @@
+from django.core.exceptions import ValidationError
+from django.db.models import Model, QuerySet
+from typing import Any, Dict, Iterable, Iterator, Optional, Set, Tuple, Type
+
+
+__all__ = [
+    "LookupCache",
+]
+
+
+def _field_matches(obj: Model, lookup: str, value: Any) -> bool:
+    """
+    Checks if a model instance matches a single get_or_create-style keyword
+    argument, without triggering any lazy fetch of related objects.
+    """
+    if lookup.endswith("__isnull"):
+        attname = obj._meta.get_field(lookup[:-len("__isnull")]).attname
+        return (getattr(obj, attname) is None) == value
+
+    if isinstance(value, Model):
+        return getattr(obj, obj._meta.get_field(lookup).attname) == value.pk
+
+    return getattr(obj, lookup) == value
+
+
+class LookupCache:
+    """
+    In-memory map of model instances keyed by a unique field. Template imports
+    prefetch every key referenced by a dataset with a single __in query, then
+    serve per-row lookups from memory. Objects created over the course of the
+    import are registered back into the map so later rows can re-use them.
+
+    If a BulkWriter is set as the cache's writer, new objects are staged with
+    it instead of being saved right away.
+    """
+
+    def __init__(self, queryset: QuerySet, key_field: str):
+        self._queryset = queryset
+        self._model = queryset.model
+        self._key_field = key_field
+        self._objects: Dict[Any, Model] = {}
+        self._looked_up: Set[Any] = set()
+        self.writer = None
+
+    def __getstate__(self) -> dict:
+        # Pickling a QuerySet evaluates it; only keep the query, so that
+        # resolved lookups can be cached without fetching the whole table.
+        return {**self.__dict__, "_queryset": self._queryset.query, "writer": None}
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        queryset = self._model.objects.all()
+        queryset.query = state["_queryset"]
+        self._queryset = queryset
+
+    @property
+    def model(self) -> Type[Model]:
+        return self._model
+
+    def __contains__(self, key) -> bool:
+        return key in self._objects
+
+    def __iter__(self) -> Iterator[Model]:
+        return iter(tuple(self._objects.values()))
+
+    def prefetch(self, keys: Iterable[Any]) -> None:
+        keys = {k for k in keys if k not in ("", None)} - self._looked_up
+        if not keys:
+            return
+
+        for obj in self._queryset.filter(**{f"{self._key_field}__in": keys}):
+            self.register(obj)
+
+        self._looked_up.update(keys)
+
+    def register(self, obj: Model) -> None:
+        self._objects[getattr(obj, self._key_field)] = obj
+
+    def get(self, key) -> Model:
+        if key not in self._objects and key not in ("", None):
+            # Fall back to the database for keys which were not part of a
+            # prefetch; misses are remembered to avoid querying twice.
+            self.prefetch((key,))
+
+        try:
+            return self._objects[key]
+        except KeyError:
+            raise self._model.DoesNotExist(
+                f"{self._model.__name__} matching query {{'{self._key_field}': {key!r}}} does not exist")
+
+    def get_or_create(self, defaults: Optional[Dict[str, Any]] = None, **kwargs) -> Tuple[Model, bool]:
+        """
+        Equivalent of QuerySet.get_or_create for keyword arguments including
+        the cache's key field. An existing object is only re-used if it
+        matches every argument; otherwise creation is attempted, which will
+        fail validation on the unique key just like get_or_create would.
+        As with get_or_create, defaults are only used for creation.
+        """
+
+        key = kwargs[self._key_field]
+
+        try:
+            obj = self.get(key)
+            if all(_field_matches(obj, k, v) for k, v in kwargs.items()):
+                return obj, False
+        except self._model.DoesNotExist:
+            pass
+
+        fields = {**{k: v for k, v in kwargs.items() if "__" not in k}, **(defaults or {})}
+
+        if self.writer is None:
+            obj = self._model.objects.create(**fields)
+        else:
+            obj = self._model(**fields)
+            self._validate_new(obj, key)
+            # Keys missing from the cache were looked up, and are known not to exist yet
+            self.writer.stage(obj, validate=False, unique_exclude=(self._key_field,))
+
+        self.register(obj)
+        return obj, True
+
+    def _validate_new(self, obj: Model, key):
+        errors = {}
+        try:
+            self.writer.clean(obj)
+        except ValidationError as e:
+            errors = e.update_error_dict(errors)
+
+        if key in self:
+            # Same error as saving the object would give
+            errors.setdefault(self._key_field, []).append(
+                obj.unique_error_message(self._model, (self._key_field,)))
+
+        if errors:
+            raise ValidationError(errors)
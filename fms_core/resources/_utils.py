@@ -1,16 +1,39 @@
+import operator
+
+from django.db.models import Q, QuerySet
+from functools import reduce
+from import_export.instance_loaders import BaseInstanceLoader
 from tablib import Dataset
-from ..models import Container
+from typing import Dict, Iterable, Optional, Tuple
+from ..models import Container, Sample
+from ..models._validation import get_validation_context
+from ..template_reader import TemplateDataset
 from ..utils import str_normalize
 
 
 __all__ = [
+    "PreloadedInstanceLoader",
     "get_container_pk",
+    "get_samples_by_location",
+    "get_sample_by_location",
+    "register_staged_container",
     "skip_rows",
     "remove_column_from_preview",
     "add_column_to_preview",
 ]
 
 
+class PreloadedInstanceLoader(BaseInstanceLoader):
+    """
+    Instance loader serving the instances resolved by the resource ahead of
+    the import, from its preloaded_instances map of IDs to instances, so that
+    each instance is only loaded once.
+    """
+
+    def get_instance(self, row):
+        return self.resource.preloaded_instances.get(row.get("id"))
+
+
 def get_container_pk(**query):
     try:
         return Container.objects.get(**query).pk
@@ -18,8 +41,56 @@ def get_container_pk(**query):
         raise Container.DoesNotExist(f"Container matching query {query} does not exist")
 
 
+def get_samples_by_location(locations: Iterable[Tuple[str, str]],
+                            queryset: Optional[QuerySet] = None) -> Dict[Tuple[str, str], Sample]:
+    """
+    Resolves (container barcode, coordinates) pairs to samples, all with a
+    single query. Pairs which do not match any sample are left out.
+    """
+
+    locations = set(locations)
+    if not locations:
+        return {}
+
+    samples = {}
+    query = reduce(operator.or_, (Q(container__barcode=b, coordinates=c) for b, c in locations))
+    for sample in (Sample.objects.all() if queryset is None else queryset).filter(query).select_related("container"):
+        location = (sample.container.barcode, sample.coordinates)
+        if location in samples:
+            query = {"container__barcode": location[0], "coordinates": location[1]}
+            raise Sample.MultipleObjectsReturned(f"More than one sample matching query {query}")
+        samples[location] = sample
+
+    return samples
+
+
+def get_sample_by_location(samples: Dict[Tuple[str, str], Sample], location: Tuple[str, str]) -> Sample:
+    try:
+        return samples[location]
+    except KeyError:
+        query = {"container__barcode": location[0], "coordinates": location[1]}
+        raise Sample.DoesNotExist(f"Sample matching query {query} does not exist")
+
+
+def register_staged_container(container: Container):
+    """
+    Does what Container.save() would do for a new container which was staged
+    for bulk insertion instead of being saved.
+    """
+
+    container.path = container.compute_path()
+
+    context = get_validation_context()
+    if context is not None:
+        context.overlap_index(Container, "location").add(container, container.location_id)
+        # A new container is known to be empty; no need to look up its contents
+        context.overlap_index(Container, "location").preload_empty(container.pk)
+        context.overlap_index(Sample, "container", "sample").preload_empty(container.pk)
+
+
 def skip_rows(dataset: Dataset, num_rows: int = 0, col_skip: int = 1) -> None:
-    if num_rows <= 0:
+    if num_rows <= 0 or isinstance(dataset, TemplateDataset):
+        # Templates read using read_template have already had their preamble skipped
         return
     dataset_headers = dataset[num_rows - 1]
     dataset_data = dataset[num_rows:]
@@ -19,13 +19,15 @@ class ContainerResource(GenericResource):
     coordinates = Field(attribute='coordinates', column_name='Location Coordinate')
     comment = Field(attribute='comment', column_name='Comment')
 
+    template_preamble_rows = 6
+
     class Meta:
         model = Container
         import_id_fields = ('barcode',)
         fields = ('kind', 'name', 'barcode', 'location', 'coordinates',)
 
     def before_import(self, dataset, using_transactions, dry_run, **kwargs):
-        skip_rows(dataset, 6)
+        skip_rows(dataset, self.template_preamble_rows)
 
     def import_field(self, field, obj, data, is_m2m=False):
         if field.attribute == "kind":
@@ -17,6 +17,8 @@ class ContainerMoveResource(GenericResource):
     coordinates = Field(attribute="coordinates", column_name="Dest. Location Coord")
     update_comment = Field(attribute="update_comment", column_name="Update Comment")
 
+    template_preamble_rows = 6
+
     class Meta:
         model = Container
         import_id_fields = ("barcode",)
@@ -27,7 +29,7 @@ class ContainerMoveResource(GenericResource):
         )
 
     def before_import(self, dataset, using_transactions, dry_run, **kwargs):
-        skip_rows(dataset, 6)  # Skip preamble and normalize dataset
+        skip_rows(dataset, self.template_preamble_rows)  # Skip preamble and normalize dataset
 
     def import_field(self, field, obj, data, is_m2m=False):
         if field.attribute == "location":
@@ -1,10 +1,17 @@
 import reversion
 
-from django.db.models import Q
+from collections import Counter, defaultdict
+from django.core.exceptions import ValidationError
+from django.db.models import Q, Value
+from django.db.models.functions import Concat
 from import_export.fields import Field
+from import_export.instance_loaders import CachedInstanceLoader
+from typing import Dict, List, Tuple
 
+from ._bulk import BulkWriter
 from ._generic import GenericResource
-from ._utils import get_container_pk, skip_rows
+from ._utils import skip_rows
+from ..caching import schedule_table_version_bump
 from ..models import Container
 from ..utils import get_normalized_str
 from ..models._constants import TEMPORARY_RENAME_SUFFIX
@@ -20,8 +27,11 @@ class ContainerRenameResource(GenericResource):
 
     def __init__(self):
         super().__init__()
-        self.new_barcode_old_barcode_map = {}
-        self.new_barcode_old_name_map = {}
+        self.rename_errors = {}
+        self.renamed_containers = []
+        self.needs_temporary_values = False
+
+    template_preamble_rows = 6
 
     class Meta:
         model = Container
@@ -32,67 +42,141 @@ class ContainerRenameResource(GenericResource):
             "update_comment",
         )
 
-        use_bulk = True
-        batch_size = None
+        # Containers to rename are all loaded at once, along with their location
+        instance_loader_class = CachedInstanceLoader
+
+    def get_queryset(self):
+        return super().get_queryset().select_related("location")
 
     def before_import(self, dataset, using_transactions, dry_run, **kwargs):
-        skip_rows(dataset, 6)  # Skip preamble and normalize dataset
+        skip_rows(dataset, self.template_preamble_rows)  # Skip preamble and normalize dataset
 
-        old_barcodes_set = set()
-        id_col = []
+        self.rename_errors = {}
+        self.needs_temporary_values = False
+
+        rows = [(get_normalized_str(d, "Old Container Barcode"),
+                 get_normalized_str(d, "New Container Barcode"),
+                 get_normalized_str(d, "New Container Name")) for d in dataset.dict]
+
+        old_containers = {
+            barcode: (pk, name)
+            for pk, barcode, name in Container.objects.filter(barcode__in={r[0] for r in rows}).values_list(
+                "id", "barcode", "name")
+        }
 
-        for d in dataset.dict:
-            old_barcode = get_normalized_str(d, "Old Container Barcode")
+        # (id, new barcode, new name) for each container; the name is kept unless a new one is specified
+        renames = []
+        for old_barcode, new_barcode, new_name in rows:
+            pk, old_name = old_containers.get(old_barcode, (None, ""))
+            renames.append((pk, new_barcode, new_name or old_name))
+
+        # Always added, so that the rows can be loaded even if the template is invalid
+        dataset.append_col([pk for pk, _, _ in renames], header="id")
+
+        old_barcodes_set = set()
+        for old_barcode, _, _ in rows:
             if old_barcode in old_barcodes_set:
                 raise ValueError(f"Cannot rename container with barcode {old_barcode} more than once")
-
+            if old_barcode not in old_containers:
+                query = {"barcode": old_barcode}
+                raise Container.DoesNotExist(f"Container matching query {query} does not exist")
             old_barcodes_set.add(old_barcode)
-            id_col.append(get_container_pk(barcode=old_barcode))
 
-        dataset.append_col(id_col, header="id")
+        self.rename_errors = self.check_renames(renames)
+
+        # Barcodes or names taken by another of the renamed containers, as in swaps and cycles, are only free once
+        # every renamed container has moved away from its old values; see rename_containers.
+        old_barcodes = {barcode: pk for barcode, (pk, _) in old_containers.items()}
+        old_names = {name: pk for pk, name in old_containers.values()}
+        self.needs_temporary_values = any(old_barcodes.get(barcode, pk) != pk or old_names.get(name, pk) != pk
+                                          for pk, barcode, name in renames)
+
+    @staticmethod
+    def check_renames(renames: List[Tuple[int, str, str]]) -> Dict[int, Dict[str, List[str]]]:
+        """
+        Checks the uniqueness of the new barcodes and names of the renamed
+        containers, taken as a whole, so that containers can swap barcodes or
+        names. Returns validation errors by container ID.
+        """
+
+        renamed_ids = [pk for pk, _, _ in renames]
+        barcodes = Counter(barcode for _, barcode, _ in renames)
+        names = Counter(name for _, _, name in renames)
+
+        taken_barcodes = set()
+        taken_names = set()
+        for barcode, name in (Container.objects.filter(Q(barcode__in=barcodes) | Q(name__in=names))
+                              .exclude(id__in=renamed_ids).values_list("barcode", "name")):
+            taken_barcodes.add(barcode)
+            taken_names.add(name)
+
+        errors = defaultdict(dict)
+
+        for pk, barcode, name in renames:
+            for field, value, counts, taken in (("barcode", barcode, barcodes, taken_barcodes),
+                                                ("name", name, names, taken_names)):
+                if counts[value] > 1:
+                    errors[pk][field] = [f"Container {field} {value} is given to more than one container"]
+                elif value in taken:
+                    errors[pk][field] = [f"Container with {field} {value} already exists"]
+
+        return dict(errors)
 
     def import_obj(self, obj, data, dry_run):
-        old_container_barcode = get_normalized_str(data, "Old Container Barcode")
-        new_container_barcode = get_normalized_str(data, "New Container Barcode")
-        new_container_name = get_normalized_str(data, "New Container Name")
-
-        self.new_barcode_old_barcode_map[new_container_barcode] = old_container_barcode
-        self.new_barcode_old_name_map[new_container_barcode] = \
-            Container.objects.get(barcode=old_container_barcode).name
-
         # Only set new container name if a new one is specified
-        data["New Container Name"] = new_container_name or obj.name
+        data["New Container Name"] = get_normalized_str(data, "New Container Name") or obj.name
         super().import_obj(obj, data, dry_run)
 
         # Set the new barcode value
-        obj.barcode = new_container_barcode
-
-        # Do some basic validation manually, since bulk_update won't help us out here
-        #  - The validators will not be called automatically since we're not running
-        #    full_clean, so pass a special kwarg into our clean() implementation to
-        #    manually check that the barcodes and names are good without checking for
-        #    uniqueness the way full_clean() does.
+        obj.barcode = get_normalized_str(data, "New Container Barcode")
         obj.normalize()
-        obj.clean(check_regexes=True)
 
+    def validate_instance(self, instance, import_validation_errors=None, validate_unique=True):
+        # Uniqueness was checked for the whole template by before_import; the location is already loaded.
+        errors = dict(import_validation_errors or {})
+        try:
+            BulkWriter.clean(instance, exclude=errors.keys())
+        except ValidationError as e:
+            errors = e.update_error_dict(errors)
+
+        if instance.pk in self.rename_errors:
+            errors = ValidationError(self.rename_errors[instance.pk]).update_error_dict(errors)
+
+        if errors:
+            raise ValidationError(errors)
+
+    def save_instance(self, instance, using_transactions=True, dry_run=False):
+        # Containers are renamed all at once by after_import, once every row has been validated
+        self.before_save_instance(instance, using_transactions, dry_run)
+        self.renamed_containers.append(instance)
+        self.after_save_instance(instance, using_transactions, dry_run)
+
+    def after_save_instance(self, instance, using_transactions, dry_run):
         if not dry_run:
-            # Append a zero-width space to the barcode / name to avoid triggering integrity errors.
-            # These will be removed after the initial import succeeds.
-            obj.barcode = obj.barcode + TEMPORARY_RENAME_SUFFIX
-            obj.name = obj.name + TEMPORARY_RENAME_SUFFIX
+            reversion.set_comment("Renamed containers from template.")
+
+    def rename_containers(self, containers: List[Container]):
+        if not containers:
+            return
+
+        if self.needs_temporary_values:
+            # Unique constraints are checked row by row; move every renamed container to a temporary barcode and name
+            # first. These cannot be taken, since the validators do not allow the suffix in barcodes or names.
+            Container.objects.filter(id__in=[c.pk for c in containers]).update(
+                barcode=Concat("barcode", Value(TEMPORARY_RENAME_SUFFIX)),
+                name=Concat("name", Value(TEMPORARY_RENAME_SUFFIX)),
+            )
 
-    def after_save_instance(self, *args, **kwargs):
-        super().after_save_instance(*args, **kwargs)
-        reversion.set_comment("Renamed containers from template.")
+        Container.objects.bulk_update(containers, ("barcode", "name", "update_comment"))
+        schedule_table_version_bump(Container)
+
+        if reversion.is_active():
+            for container in containers:
+                reversion.add_to_revision(container)
 
     def after_import(self, dataset, result, using_transactions, dry_run, **kwargs):
-        if not dry_run:
-            # Remove the zero-width spaces introduced before, ideally without errors.
-            # If there are integrity errors, django-import-export will revert to the save-point.
-            for container in Container.objects.filter(
-                    Q(barcode__endswith=TEMPORARY_RENAME_SUFFIX) | Q(name__endswith=TEMPORARY_RENAME_SUFFIX)):
-                container.barcode = container.barcode.replace(TEMPORARY_RENAME_SUFFIX, "")
-                container.name = container.name.replace(TEMPORARY_RENAME_SUFFIX, "")
-                container.save()  # Will also run normalize and full_clean
+        if not dry_run and not (result.has_errors() or result.has_validation_errors()):
+            self.rename_containers(self.renamed_containers)
+        self.renamed_containers = []
 
         return super().after_import(dataset, result, using_transactions, dry_run, **kwargs)
@@ -1,15 +1,25 @@
 import reversion
 
+from collections import defaultdict
 from datetime import datetime
+from decimal import Decimal
+from django.core.exceptions import ValidationError
 from import_export.fields import Field
 from import_export.widgets import DateWidget, DecimalWidget, JSONWidget, ForeignKeyWidget
 from ._generic import GenericResource
-from ._utils import skip_rows
+from ._lookups import LookupCache
+from ._utils import (
+    get_samples_by_location,
+    get_sample_by_location,
+    register_staged_container,
+    skip_rows,
+)
 from ..containers import (
     CONTAINER_SPEC_TUBE,
     CONTAINER_SPEC_TUBE_RACK_8X12,
 )
 from ..models import Container, Sample, SampleKind
+from ..models._validation import get_validation_context
 from ..utils import (
     VolumeHistoryUpdateType,
     blank_str_to_none,
@@ -41,6 +51,8 @@ class ExtractionResource(GenericResource):
     creation_date = Field(attribute='creation_date', column_name='Extraction Date', widget=DateWidget())
     comment = Field(attribute='comment', column_name='Comment')
 
+    template_preamble_rows = 7
+
     class Meta:
         model = Sample
         import_id_fields = ()
@@ -72,8 +84,59 @@ class ExtractionResource(GenericResource):
             'comment',
         )
 
+    # New containers and extracted samples are inserted in bulk, along with
+    # the updates to the source samples.
+    bulk_import = True
+
+    lookup_caches = {
+        "sample_kinds": SampleKind,
+        "containers": Container,
+    }
+
+    def __init__(self):
+        super().__init__()
+        self.sample_kinds = None
+        self.containers = None
+        self.sources = {}
+        self.volume_used_by_source = defaultdict(Decimal)
+
     def before_import(self, dataset, using_transactions, dry_run, **kwargs):
-        skip_rows(dataset, 7)  # Skip preamble
+        skip_rows(dataset, self.template_preamble_rows)  # Skip preamble
+
+        # Resolve every sample kind, source sample and destination container
+        # referenced by the dataset up front, so that rows are imported without
+        # querying per lookup.
+
+        rows = dataset.dict
+
+        if not self.restore_lookups():
+            self.sample_kinds = LookupCache(SampleKind.objects.all(), "name")
+            self.containers = LookupCache(Container.objects.select_related("location"), "barcode")
+
+            self.sample_kinds.prefetch(d.get("Extraction Type") for d in rows)
+            self.containers.prefetch(
+                get_normalized_str(d, column)
+                for d in rows
+                for column in ("Nucleic Acid Location Barcode", "Nucleic Acid Container Barcode"))
+
+            self.snapshot_lookups()
+
+        self.containers.writer = self.bulk_writer
+
+        # Source samples are updated by the import, so they are never part of a snapshot
+        self.sources = get_samples_by_location(
+            ((get_normalized_str(d, "Container Barcode"), get_normalized_str(d, "Location Coord")) for d in rows),
+            Sample.objects.select_related("sample_kind", "individual"))
+        self.volume_used_by_source = defaultdict(Decimal)
+
+        # Load the occupied coordinates of every destination at once, for
+        # in-memory overlap validation of the rows.
+        context = get_validation_context()
+        if context is not None:
+            context.overlap_index(Sample, "container", "sample").preload(c.pk for c in self.containers)
+            context.overlap_index(Container, "location").preload(c.pk for c in self.containers)
+            # Related objects of the rows are served from the lookups while validating
+            context.add_objects((*self.sample_kinds, *self.containers, *self.sources.values()))
 
     def import_field(self, field, obj, data, is_m2m=False):
         # More!! ugly hacks
@@ -83,7 +146,7 @@ class ExtractionResource(GenericResource):
             return
 
         if field.attribute == "sample_kind_name":
-            obj.sample_kind = SampleKind.objects.get(name=data["Extraction Type"])
+            obj.sample_kind = self.sample_kinds.get(data["Extraction Type"])
 
         if field.attribute == 'volume_history':
             # We store volume as a JSON object of historical values, so this
@@ -98,10 +161,10 @@ class ExtractionResource(GenericResource):
             return
 
         if field.attribute == 'extracted_from':
-            obj.extracted_from = Sample.objects.get(
-                container__barcode=get_normalized_str(data, "Container Barcode"),
-                coordinates=get_normalized_str(data, "Location Coord"),
-            )
+            obj.extracted_from = get_sample_by_location(self.sources, (
+                get_normalized_str(data, "Container Barcode"),
+                get_normalized_str(data, "Location Coord"),
+            ))
             # Cast the "Source Depleted" cell to a Python Boolean value and
             # update the original sample if needed. This is the act of the
             # extracted sample depleting the original in the process of its
@@ -115,26 +178,22 @@ class ExtractionResource(GenericResource):
             # needed for extractions, using the inputted barcode for the new
             # object.
 
-            shared_parent_info = dict(
-                barcode=get_normalized_str(data, "Nucleic Acid Location Barcode"),
+            comment = f"Automatically generated via extraction template import on {datetime.utcnow().isoformat()}Z"
+
+            parent_barcode = get_normalized_str(data, "Nucleic Acid Location Barcode")
+            parent, created = self.containers.get_or_create(
+                barcode=parent_barcode,
                 # TODO: Currently can only extract into tube racks 8x12
                 #  - otherwise this logic will fall apart
-                kind=CONTAINER_SPEC_TUBE_RACK_8X12.container_kind_id
+                kind=CONTAINER_SPEC_TUBE_RACK_8X12.container_kind_id,
+                # Below is creation-specific data
+                # Leave coordinates blank if creating
+                # Per Alex: Container name = container barcode if we
+                #           auto-generate the container
+                defaults=dict(name=parent_barcode, comment=comment),
             )
-
-            try:
-                parent = Container.objects.get(**shared_parent_info)
-            except Container.DoesNotExist:
-                parent = Container.objects.create(
-                    **shared_parent_info,
-                    # Below is creation-specific data
-                    # Leave coordinates blank if creating
-                    # Per Alex: Container name = container barcode if we
-                    #           auto-generate the container
-                    name=shared_parent_info["barcode"],
-                    comment=f"Automatically generated via extraction template import on "
-                            f"{datetime.utcnow().isoformat()}Z"
-                )
+            if created:
+                register_staged_container(parent)
 
             # Per Alex: We can make new tubes if needed for extractions
 
@@ -142,27 +201,21 @@ class ExtractionResource(GenericResource):
             # tube container. It is of type tube specifically because, as
             # mentioned above, extractions currently only occur into 8x12 tube
             # racks.
-            shared_container_info = dict(
-                barcode=get_normalized_str(data, "Nucleic Acid Container Barcode"),
+            container_barcode = get_normalized_str(data, "Nucleic Acid Container Barcode")
+            obj.container, created = self.containers.get_or_create(
+                barcode=container_barcode,
                 # TODO: Currently can only extract into tubes
                 #  - otherwise this logic will fall apart
                 kind=CONTAINER_SPEC_TUBE.container_kind_id,
                 location=parent,
                 coordinates=get_normalized_str(data, "Nucleic Acid Location Coord"),
+                # Below is creation-specific data
+                # Per Alex: Container name = container barcode if we
+                #           auto-generate the container
+                defaults=dict(name=container_barcode, comment=comment),
             )
-
-            try:
-                obj.container = Container.objects.get(**shared_container_info)
-            except Container.DoesNotExist:
-                obj.container = Container.objects.create(
-                    **shared_container_info,
-                    # Below is creation-specific data
-                    # Per Alex: Container name = container barcode if we
-                    #           auto-generate the container
-                    name=shared_container_info["barcode"],
-                    comment=f"Automatically generated via extraction template import on "
-                            f"{datetime.utcnow().isoformat()}Z"
-                )
+            if created:
+                register_staged_container(obj.container)
 
             return
 
@@ -188,19 +241,37 @@ class ExtractionResource(GenericResource):
         super().before_save_instance(instance, using_transactions, dry_run)
 
     def after_save_instance(self, instance, using_transactions, dry_run):
+        super().after_save_instance(instance, using_transactions, dry_run)
+
+        # Done by Sample.save() for samples which are saved right away
+        context = get_validation_context()
+        if context is not None:
+            context.overlap_index(Sample, "container", "sample").add(instance, instance.container_id)
+
         # Update volume and depletion status of original sample, thus recording
         # that the volume was reduced by an extraction process, including an ID
-        # to refer back to the extracted sample.
-        instance.extracted_from.volume_history.append(create_volume_history(
+        # to refer back to the extracted sample. A source shared by several
+        # extractions is the same instance for every row, and is only saved
+        # (and versioned) once, along with the extracted samples.
+        source = instance.extracted_from
+        remaining_volume = source.volume - instance.volume_used
+
+        # Checked before the source is changed, so that a failed row does not affect later rows using the same source
+        if remaining_volume < Decimal("0"):
+            raise ValidationError({"volume_used": f"Volume used exceeds the remaining volume of {source}"})
+
+        source.volume_history.append(create_volume_history(
             VolumeHistoryUpdateType.EXTRACTION,
-            instance.extracted_from.volume - instance.volume_used,
+            remaining_volume,
             instance.id
         ))
+        source.current_volume = source.volume
 
-        instance.extracted_from.update_comment = f"Extracted sample (imported from template) consumed " \
-                                                 f"{instance.volume_used} µL."
+        self.volume_used_by_source[source.pk] += instance.volume_used
+        source.update_comment = f"Extracted sample (imported from template) consumed " \
+                                f"{self.volume_used_by_source[source.pk]} µL."
 
-        instance.extracted_from.save()
+        self.bulk_writer.stage_update(source, ("volume_history", "current_volume", "depleted", "update_comment"))
 
-        super().after_save_instance(instance, using_transactions, dry_run)
-        reversion.set_comment("Imported extracted samples from template.")
+        if not dry_run:
+            reversion.set_comment("Imported extracted samples from template.")
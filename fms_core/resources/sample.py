@@ -6,12 +6,14 @@ from django.contrib import messages
 from import_export.fields import Field
 from import_export.widgets import DateWidget, DecimalWidget, JSONWidget
 from ._generic import GenericResource
-from ._utils import skip_rows
+from ._lookups import LookupCache
+from ._utils import register_staged_container, skip_rows
 from ..containers import (
     SAMPLE_CONTAINER_KINDS,
     SAMPLE_CONTAINER_KINDS_WITH_COORDS,
 )
 from ..models import Container, Individual, Sample, SampleKind
+from ..models._validation import get_validation_context
 from ..utils import (
     RE_SEPARATOR,
     VolumeHistoryUpdateType,
@@ -80,6 +82,8 @@ class SampleResource(GenericResource):
         "context_sensitive_coordinates",
     ))
 
+    template_preamble_rows = 6
+
     class Meta:
         model = Sample
         import_id_fields = ("container__barcode", "context_sensitive_coordinates")
@@ -118,8 +122,57 @@ class SampleResource(GenericResource):
             "comment",
         )
 
+    # New individuals, containers and samples are inserted in bulk
+    bulk_import = True
+
+    lookup_caches = {
+        "sample_kinds": SampleKind,
+        "containers": Container,
+        "individuals": Individual,
+    }
+
+    def __init__(self):
+        super().__init__()
+        self.sample_kinds = None
+        self.containers = None
+        self.individuals = None
+
     def before_import(self, dataset, using_transactions, dry_run, **kwargs):
-        skip_rows(dataset, 6)
+        skip_rows(dataset, self.template_preamble_rows)
+
+        # Resolve every sample kind, container and individual referenced by
+        # the dataset with a handful of queries up front; rows are then
+        # imported using these in-memory maps instead of querying per lookup.
+
+        if not self.restore_lookups():
+            self.sample_kinds = LookupCache(SampleKind.objects.all(), "name")
+            self.containers = LookupCache(Container.objects.select_related("location"), "barcode")
+            self.individuals = LookupCache(Individual.objects.all(), "name")
+
+            rows = dataset.dict
+
+            self.sample_kinds.prefetch(d.get("Sample Kind") for d in rows)
+            self.containers.prefetch(
+                get_normalized_str(d, column) for d in rows for column in ("Container Barcode", "Location Barcode"))
+            self.individuals.prefetch(
+                get_normalized_str(d, column) for d in rows for column in ("Individual ID", "Mother ID", "Father ID"))
+
+            self.snapshot_lookups()
+
+        if self.bulk_writer is not None:
+            self.containers.writer = self.bulk_writer
+            self.individuals.writer = self.bulk_writer
+            self.bulk_writer.preload_unique(
+                Container, "name", (get_normalized_str(d, "Container Name") for d in dataset.dict))
+
+        # Load the occupied coordinates of every container touched by the
+        # import at once, for in-memory overlap validation of the rows.
+        context = get_validation_context()
+        if context is not None:
+            context.overlap_index(Sample, "container", "sample").preload(c.pk for c in self.containers)
+            context.overlap_index(Container, "location").preload(c.pk for c in self.containers)
+            # Related objects of the rows are served from the lookups while validating
+            context.add_objects((*self.sample_kinds, *self.containers))
 
     def import_obj(self, obj, data, dry_run):
         super().import_obj(obj, data, dry_run)
@@ -137,7 +190,7 @@ class SampleResource(GenericResource):
         father = None
 
         if data["Mother ID"]:
-            mother, _ = Individual.objects.get_or_create(
+            mother, _ = self.individuals.get_or_create(
                 name=get_normalized_str(data, "Mother ID"),
                 sex=Individual.SEX_FEMALE,
                 taxon=taxon,  # Mother has same taxon as offspring
@@ -146,7 +199,7 @@ class SampleResource(GenericResource):
             )
 
         if data["Father ID"]:
-            father, _ = Individual.objects.get_or_create(
+            father, _ = self.individuals.get_or_create(
                 name=get_normalized_str(data, "Father ID"),
                 sex=Individual.SEX_MALE,
                 taxon=taxon,  # Father has same taxon as offspring
@@ -156,7 +209,7 @@ class SampleResource(GenericResource):
 
         # TODO: This should throw a nicer warning if the individual already exists
         # TODO: Warn if the individual exists but pedigree/cohort is different
-        individual, individual_created = Individual.objects.get_or_create(
+        individual, individual_created = self.individuals.get_or_create(
             name=get_normalized_str(data, "Individual ID"),
             sex=get_normalized_str(data, "Sex", default=Individual.SEX_UNKNOWN),
             taxon=taxon,
@@ -191,7 +244,7 @@ class SampleResource(GenericResource):
         normalized_container_kind = get_normalized_str(data, "Container Kind").lower()
 
         if field.attribute == "sample_kind_name":
-            obj.sample_kind = SampleKind.objects.get(name=data["Sample Kind"])
+            obj.sample_kind = self.sample_kinds.get(data["Sample Kind"])
 
         elif field.attribute == "container_barcode" and normalized_container_kind in SAMPLE_CONTAINER_KINDS:
             # Oddly enough, Location Coord is contextual - when Container Kind
@@ -203,7 +256,7 @@ class SampleResource(GenericResource):
             location_barcode = get_normalized_str(data, "Location Barcode")
 
             try:
-                container_parent = Container.objects.get(barcode=location_barcode)
+                container_parent = self.containers.get(location_barcode)
             except Container.DoesNotExist:
                 if location_barcode:
                     # If a parent container barcode was specified, raise a
@@ -236,7 +289,9 @@ class SampleResource(GenericResource):
             # existing barcode record in the database, which serves as an
             # ad-hoc additional validation step.
 
-            container, _ = Container.objects.get_or_create(**container_data)
+            container, created = self.containers.get_or_create(**container_data)
+            if created and self.bulk_writer is not None:
+                register_staged_container(container)
             obj.container = container
 
             return
@@ -268,9 +323,18 @@ class SampleResource(GenericResource):
 
     def before_save_instance(self, instance, using_transactions, dry_run):
         # TODO: Don't think this is needed
-        instance.individual.save()
+        if self.bulk_writer is None:
+            instance.individual.save()
         super().before_save_instance(instance, using_transactions, dry_run)
 
     def after_save_instance(self, instance, using_transactions, dry_run):
         super().after_save_instance(instance, using_transactions, dry_run)
-        reversion.set_comment("Imported samples from template.")
+
+        if self.bulk_writer is not None:
+            # Done by Sample.save() for samples which are saved right away
+            context = get_validation_context()
+            if context is not None:
+                context.overlap_index(Sample, "container", "sample").add(instance, instance.container_id)
+
+        if not dry_run:
+            reversion.set_comment("Imported samples from template.")
@@ -5,9 +5,17 @@ import ast
 from decimal import Decimal
 from import_export.fields import Field
 from import_export.widgets import ForeignKeyWidget
+from typing import Dict, Iterable, Tuple
 from ._generic import GenericResource
-from ._utils import skip_rows, add_column_to_preview
+from ._utils import (
+    PreloadedInstanceLoader,
+    get_samples_by_location,
+    get_sample_by_location,
+    skip_rows,
+    add_column_to_preview,
+)
 from ..models import Container, Sample
+from ..models._validation import get_validation_context
 from ..utils import (
     VolumeHistoryUpdateType,
     blank_str_to_none,
@@ -33,6 +41,8 @@ class SampleUpdateResource(GenericResource):
     depleted = Field(attribute="depleted", column_name="Depleted")
     update_comment = Field(attribute="update_comment", column_name="Update Comment")
 
+    template_preamble_rows = 6
+
     class Meta:
         model = Sample
         import_id_fields = ('id',)
@@ -43,24 +53,40 @@ class SampleUpdateResource(GenericResource):
             'update_comment',
         )
         exclude = ('container', 'coordinates')
+        instance_loader_class = PreloadedInstanceLoader
+
+    def __init__(self):
+        super().__init__()
+        self.preloaded_instances = {}
 
     @staticmethod
-    def _get_sample_pk(**query):
-        try:
-            return Sample.objects.get(**query).pk
-        except Sample.DoesNotExist:
-            raise Sample.DoesNotExist(f"Sample matching query {query} does not exist")
+    def _resolve_samples(locations: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], Sample]:
+        locations = set(locations)
+        samples = get_samples_by_location(
+            locations, Sample.objects.select_related("sample_kind", "container__location"))
+        for location in locations:
+            get_sample_by_location(samples, location)  # Raises if the sample does not exist
+        return samples
 
     def before_import(self, dataset, using_transactions, dry_run, **kwargs):
-        skip_rows(dataset, 6)  # Skip preamble
+        skip_rows(dataset, self.template_preamble_rows)  # Skip preamble
+
+        locations = [
+            (get_normalized_str(d, "Container Barcode"), get_normalized_str(d, "Coord (if plate)"))
+            for d in dataset.dict
+        ]
+        samples = SampleUpdateResource._resolve_samples(locations)
+
+        # Resolved samples are handed to the import as they are, rather than loaded again by ID
+        self.preloaded_instances = {sample.pk: sample for sample in samples.values()}
+
+        context = get_validation_context()
+        if context is not None:
+            # Samples extracted from one another within the template share instances while validating
+            context.add_objects(samples.values())
 
         # add column 'id' with pk
-        dataset.append_col([
-            SampleUpdateResource._get_sample_pk(
-                container__barcode=get_normalized_str(d, "Container Barcode"),
-                coordinates=get_normalized_str(d, "Coord (if plate)"),
-            ) for d in dataset.dict
-        ], header="id")
+        dataset.append_col([samples[location].pk for location in locations], header="id")
 
         super().before_import(dataset, using_transactions, dry_run, **kwargs)
 
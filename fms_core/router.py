@@ -3,7 +3,9 @@ from rest_framework import routers
 from .viewsets import (
     ContainerKindViewSet,
     ContainerViewSet,
+    FieldChangeViewSet,
     IndividualViewSet,
+    ImportJobViewSet,
     QueryViewSet,
     SampleViewSet,
     SampleKindViewSet,
@@ -20,7 +22,9 @@ router.register(r"containers", ContainerViewSet)
 router.register(r"sample-kinds", SampleKindViewSet, basename="sample-kind")
 router.register(r"samples", SampleViewSet)
 router.register(r"individuals", IndividualViewSet)
+router.register(r"import-jobs", ImportJobViewSet)
 router.register(r"query", QueryViewSet, basename="query")
 router.register(r"versions", VersionViewSet)
+router.register(r"field-changes", FieldChangeViewSet)
 router.register(r"users", UserViewSet)
 router.register(r"groups", GroupViewSet)
@@ -0,0 +1,123 @@
+"""
+Global search over containers, individuals, samples and users. Candidates
+are first narrowed down using the trigram indexes on the searched columns;
+only a bounded number of candidates per model is then scored with fzy (from
+the pg_fzy extension). All models are searched and ranked in a single UNION
+query.
+"""
+
+from collections import defaultdict
+from django.contrib.auth.models import User
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import BooleanField, CharField, F, FloatField, Func, Value
+from django.db.models.functions import Greatest
+from typing import List, Tuple
+
+from .models import Container, Individual, Sample
+
+
+__all__ = [
+    "FZY",
+    "TrigramMatch",
+    "SEARCHABLE_MODELS",
+    "global_search",
+]
+
+
+# Maximum number of candidates scored per model, and of results returned
+CANDIDATE_LIMIT = 500
+RESULT_LIMIT = 100
+
+# (result type, model, searched fields)
+SEARCHABLE_MODELS = (
+    ("container", Container, ("name",)),
+    ("individual", Individual, ("name",)),
+    ("sample", Sample, ("name",)),
+    ("user", User, ("username", "first_name", "last_name")),
+)
+
+
+class FZY(Func):
+    """
+    fzy score of a column for a search term, which is passed as a bound
+    parameter.
+    """
+
+    function = "fzy"
+    arg_joiner = "::cstring, "
+    template = "%(function)s(%(expressions)s::cstring)"
+    output_field = FloatField()
+
+    def __init__(self, expression, search_term: str, **extras):
+        super().__init__(Value(search_term), expression, **extras)
+
+
+class TrigramMatch(Func):
+    """
+    Matches rows where any of the specified columns is similar to, or
+    contains, the search term. Columns are compared as UPPER(column::text)
+    so that the trigram indexes on that expression can be used.
+    """
+
+    output_field = BooleanField()
+
+    def __init__(self, search_term: str, *expressions):
+        super().__init__(*expressions)
+        self.search_term = search_term
+
+    def as_sql(self, compiler, connection, **extra_context):
+        pattern = f"%{connection.ops.prep_for_like_query(self.search_term)}%"
+
+        conditions = []
+        params = []
+        for expression in self.get_source_expressions():
+            column_sql, column_params = compiler.compile(expression)
+            conditions.append(f"UPPER({column_sql}::text) %% UPPER(%s)")
+            conditions.append(f"UPPER({column_sql}::text) LIKE UPPER(%s)")
+            params.extend((*column_params, self.search_term, *column_params, pattern))
+
+        return f"({' OR '.join(conditions)})", params
+
+
+def _greatest(expressions: list):
+    return expressions[0] if len(expressions) == 1 else Greatest(*expressions)
+
+
+def _scored_candidates(result_type: str, model, fields: Tuple[str, ...], search_term: str):
+    # The most similar matches are kept as candidates, so that the best results are not left out on large tables
+    similarity = _greatest([TrigramSimilarity(f, search_term) for f in fields])
+    candidates = (model.objects.filter(TrigramMatch(search_term, *map(F, fields)))
+                  .order_by(similarity.desc()).values("pk")[:CANDIDATE_LIMIT])
+    scores = [FZY(F(f), search_term) for f in fields]
+    return model.objects.filter(pk__in=candidates).annotate(
+        result_type=Value(result_type, output_field=CharField()),
+        result_id=F("pk"),
+        score=_greatest(scores),
+    ).filter(score__gt=0).values_list("result_type", "result_id", "score")
+
+
+def global_search(search_term: str, limit: int = RESULT_LIMIT) -> List[dict]:
+    """
+    Returns the best-scoring objects for a search term across all searchable
+    models, as a list of {"type", "item", "score"} dictionaries sorted by
+    decreasing score.
+    """
+
+    queries = [_scored_candidates(t, m, fs, search_term) for t, m, fs in SEARCHABLE_MODELS]
+    results = list(queries[0].union(*queries[1:], all=True).order_by("-score")[:limit])
+
+    ids_by_type = defaultdict(list)
+    for result_type, result_id, _ in results:
+        ids_by_type[result_type].append(result_id)
+
+    objects_by_type = {
+        result_type: model.objects.in_bulk(ids_by_type[result_type])
+        for result_type, model, _ in SEARCHABLE_MODELS
+        if ids_by_type[result_type]
+    }
+
+    return [
+        {"type": result_type, "item": objects_by_type[result_type][result_id], "score": score}
+        for result_type, result_id, score in results
+        if result_id in objects_by_type[result_type]
+    ]
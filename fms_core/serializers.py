@@ -1,8 +1,11 @@
 from django.contrib.auth.models import User, Group
+from django.db.models import QuerySet, Value
+from django.db.models.functions import Coalesce
 from rest_framework import serializers
 from reversion.models import Version
 
-from .models import Container, Sample, Individual, SampleKind
+from .change_log import with_has_previous_version
+from .models import Container, Sample, Individual, SampleKind, ImportJob, FieldChange
 
 
 __all__ = [
@@ -14,7 +17,10 @@ __all__ = [
     "SampleSerializer",
     "SampleExportSerializer",
     "NestedSampleSerializer",
+    "ImportJobSerializer",
     "VersionSerializer",
+    "VersionSummarySerializer",
+    "FieldChangeSerializer",
     "UserSerializer",
     "GroupSerializer",
 ]
@@ -62,25 +68,39 @@ class SampleSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class SampleExportSerializer(serializers.ModelSerializer):
-    sample_kind = serializers.CharField(read_only=True, source="sample_kind.name")
-    sample_name = serializers.CharField(source="name")
-    individual_id = serializers.CharField(read_only=True, source="individual.name")
-    taxon = serializers.CharField(read_only=True, source="individual.taxon")
-    sex = serializers.CharField(read_only=True, source="individual.sex")
-    pedigree = serializers.CharField(read_only=True, source="individual.pedigree")
-    cohort = serializers.CharField(read_only=True, source="individual.cohort")
-    mother_name = serializers.SerializerMethodField()
-    father_name = serializers.SerializerMethodField()
-    container_kind = serializers.CharField(read_only=True, source="container.kind")
-    container_name = serializers.CharField(read_only=True, source="container.name")
-    container_barcode = serializers.CharField(read_only=True, source="container.barcode")
-    location_coord = serializers.CharField(read_only=True, source="container.coordinates")
-    location_barcode = serializers.SerializerMethodField()
-    current_volume = serializers.SerializerMethodField()
+class SampleExportSerializer(serializers.Serializer):
+    """
+    Serializes flat sample records as produced by get_export_queryset, rather
+    than model instances, so that exporting a sample does not require fetching
+    any related object.
+    """
+
+    sample_kind = serializers.CharField(read_only=True, source="sample_kind__name")
+    sample_name = serializers.CharField(read_only=True, source="name")
+    alias = serializers.CharField(read_only=True)
+    cohort = serializers.CharField(read_only=True, source="individual__cohort")
+    taxon = serializers.CharField(read_only=True, source="individual__taxon")
+    container_kind = serializers.CharField(read_only=True, source="container__kind")
+    container_name = serializers.CharField(read_only=True, source="container__name")
+    container_barcode = serializers.CharField(read_only=True, source="container__barcode")
+    location_barcode = serializers.CharField(read_only=True)
+    location_coord = serializers.CharField(read_only=True, source="container__coordinates")
+    individual_id = serializers.CharField(read_only=True, source="individual__name")
+    sex = serializers.CharField(read_only=True, source="individual__sex")
+    pedigree = serializers.CharField(read_only=True, source="individual__pedigree")
+    mother_name = serializers.CharField(read_only=True)
+    father_name = serializers.CharField(read_only=True)
+    current_volume = serializers.DecimalField(read_only=True, max_digits=20, decimal_places=3)
+    concentration = serializers.DecimalField(read_only=True, max_digits=20, decimal_places=3)
+    collection_site = serializers.CharField(read_only=True)
+    tissue_source = serializers.CharField(read_only=True)
+    creation_date = serializers.DateField(read_only=True)
+    phenotype = serializers.CharField(read_only=True)
+    depleted = serializers.BooleanField(read_only=True)
+    coordinates = serializers.CharField(read_only=True)
+    comment = serializers.CharField(read_only=True)
 
     class Meta:
-        model = Sample
         fields = ('sample_kind', 'sample_name', 'alias', 'cohort', 'taxon',
                   'container_kind', 'container_name', 'container_barcode', 'location_barcode', 'location_coord',
                   'individual_id', 'sex', 'pedigree', 'mother_name', 'father_name',
@@ -88,22 +108,38 @@ class SampleExportSerializer(serializers.ModelSerializer):
                   'depleted', 'coordinates',
                   'comment')
 
-    def get_location_barcode(self, obj):
-        if obj.container.location is None:
-            return ''
-        else:
-            return obj.container.location.barcode
-
-    def get_current_volume(self, obj):
-        return obj.volume
-
-    def get_father_name(self, obj):
-        father = '' if obj.individual.father is None else obj.individual.father.name
-        return father
-
-    def get_mother_name(self, obj):
-        mother = '' if obj.individual.mother is None else obj.individual.mother.name
-        return mother
+    @staticmethod
+    def get_export_queryset(queryset: QuerySet) -> QuerySet:
+        """
+        Flattens a sample queryset into the columns needed for export, joining
+        related tables in the same query.
+        """
+        return queryset.values(
+            "sample_kind__name",
+            "name",
+            "alias",
+            "individual__cohort",
+            "individual__taxon",
+            "container__kind",
+            "container__name",
+            "container__barcode",
+            "container__coordinates",
+            "individual__name",
+            "individual__sex",
+            "individual__pedigree",
+            "current_volume",
+            "concentration",
+            "collection_site",
+            "tissue_source",
+            "creation_date",
+            "phenotype",
+            "depleted",
+            "coordinates",
+            "comment",
+            location_barcode=Coalesce("container__location__barcode", Value("")),
+            mother_name=Coalesce("individual__mother__name", Value("")),
+            father_name=Coalesce("individual__father__name", Value("")),
+        )
 
 
 class NestedSampleSerializer(serializers.ModelSerializer):
@@ -117,6 +153,14 @@ class NestedSampleSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+class ImportJobSerializer(serializers.ModelSerializer):
+    filename = serializers.CharField(source="imported_file.filename", read_only=True)
+
+    class Meta:
+        model = ImportJob
+        exclude = ("imported_file",)
+
+
 class VersionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Version
@@ -124,6 +168,51 @@ class VersionSerializer(serializers.ModelSerializer):
         depth = 1
 
 
+class VersionSummarySerializer(serializers.ModelSerializer):
+    """
+    Compact representation of versions, for listings: the revision's date,
+    user and comment, and the names of the fields changed since the previous
+    version of the same object (null for an object's first version), rather
+    than the whole serialized snapshot. Expects versions from
+    get_summary_queryset.
+    """
+
+    date_created = serializers.DateTimeField(read_only=True, source="revision.date_created")
+    user = serializers.PrimaryKeyRelatedField(read_only=True, source="revision.user")
+    comment = serializers.CharField(read_only=True, source="revision.comment")
+    changed_fields = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Version
+        fields = ("id", "object_id", "content_type", "object_repr", "revision", "date_created", "user", "comment",
+                  "changed_fields")
+
+    @staticmethod
+    def get_summary_queryset(queryset: QuerySet) -> QuerySet:
+        """
+        Joins the revision of each version and prefetches its logged field
+        changes, leaving out the serialized snapshot, so that changes are
+        found with a single extra query.
+        """
+        return with_has_previous_version(
+            queryset
+            .select_related("revision")
+            .defer("serialized_data")
+            .prefetch_related("field_changes")
+        )
+
+    def get_changed_fields(self, obj):
+        if not obj.has_previous_version:
+            return None
+        return sorted(c.field for c in obj.field_changes.all())
+
+
+class FieldChangeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = FieldChange
+        fields = "__all__"
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -0,0 +1,30 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from reversion.signals import post_revision_commit
+
+from .caching import schedule_table_version_bump
+from .change_log import record_field_changes
+from .models import Container, Individual, Sample, SampleKind
+
+
+__all__ = [
+    "VERSIONED_MODELS",
+]
+
+
+# Models whose table versions are tracked for cache invalidation. Bulk operations which bypass these signals
+# (queryset.update, bulk_create, bulk_update) must bump table versions themselves.
+VERSIONED_MODELS = (Container, Individual, Sample, SampleKind)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def bump_table_version(sender, using=None, **kwargs):
+    if sender in VERSIONED_MODELS:
+        schedule_table_version_bump(sender, using=using)
+
+
+@receiver(post_revision_commit)
+def log_field_changes(sender, revision, versions, **kwargs):
+    # Also sent for versions saved in bulk by template imports; see BulkWriter
+    record_field_changes(versions)
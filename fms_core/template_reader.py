@@ -0,0 +1,153 @@
+"""
+Streaming reader for submitted template files. Rows are read one at a time
+from the uploaded file, using openpyxl's read-only mode for XLSX files and
+the csv module for CSV files, so that memory use is bounded by the size of
+the template's data rather than by the size of the upload.
+"""
+
+import codecs
+import csv
+
+from openpyxl import load_workbook
+from tablib import Dataset
+from typing import Iterable, Iterator, Optional, Sequence
+
+from .utils import str_normalize
+
+
+__all__ = [
+    "TemplateReadError",
+    "TemplateDataset",
+    "iter_template_rows",
+    "read_template",
+]
+
+
+# Number of consecutive empty rows after which the rest of a file is ignored.
+# Spreadsheets often report formatted but otherwise empty cells far below the
+# data; these are never read.
+EMPTY_ROWS_LIMIT = 100
+
+# Maximum number of columns read from a template
+MAX_COLUMNS = 256
+
+
+class TemplateReadError(Exception):
+    pass
+
+
+class TemplateDataset(Dataset):
+    """
+    Dataset read from a template with its preamble rows already skipped, and
+    its values normalized; see skip_rows.
+    """
+
+
+def _is_empty(row: Sequence, col_skip: int = 0) -> bool:
+    return all(c is None or c == "" for c in row[col_skip:])
+
+
+def _xlsx_rows(template_file, data_only: bool) -> Iterator[tuple]:
+    workbook = load_workbook(template_file, read_only=True, data_only=data_only)
+    try:
+        sheet = workbook.active
+        # Rows are padded to the width of the sheet, where the sheet declares it
+        yield from sheet.iter_rows(max_col=min(sheet.max_column or MAX_COLUMNS, MAX_COLUMNS), values_only=True)
+    finally:
+        workbook.close()
+
+
+def _csv_rows(template_file) -> Iterator[list]:
+    reader = csv.reader(codecs.iterdecode(template_file, "utf-8"))
+
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except UnicodeDecodeError:
+            # Raised before the line is counted by the reader
+            raise TemplateReadError(f"Line {reader.line_num + 1} is not valid UTF-8 text")
+        except csv.Error as e:
+            raise TemplateReadError(f"Line {reader.line_num} could not be read: {e}")
+
+        # Like tablib, ignore completely blank lines
+        if row:
+            yield row[:MAX_COLUMNS]
+
+
+def iter_template_rows(template_file, xlsx: bool, data_only: bool = True) -> Iterator[Sequence]:
+    """
+    Lazily yields the rows of a template file, which may be an XLSX or a
+    UTF-8 encoded CSV file, as sequences of cell values. Empty rows are yielded as they are,
+    except for the trailing empty region of the file, where reading stops.
+    Like tablib, XLSX formulas are read as the values last computed for them
+    (None if the file was saved without them), unless data_only is False.
+    """
+
+    rows = _xlsx_rows(template_file, data_only) if xlsx else _csv_rows(template_file)
+
+    empty_rows = 0
+    for row in rows:
+        if _is_empty(row):
+            empty_rows += 1
+            if empty_rows >= EMPTY_ROWS_LIMIT:
+                return
+            continue
+
+        # Empty rows followed by data are part of the template
+        for _ in range(empty_rows):
+            yield ()
+        empty_rows = 0
+
+        yield row
+
+
+def _data_row(row: Sequence, width: int, row_number: int) -> tuple:
+    if len(row) > width and not _is_empty(row[width:]):
+        raise TemplateReadError(f"Row {row_number} has more values than there are columns in the template")
+
+    return tuple(
+        str_normalize(c) if isinstance(c, str) else ("" if c is None else c)
+        for c in (*row[:width], *(None,) * (width - len(row)))
+    )
+
+
+def read_template(template_file, file_name: str, preamble_rows: int = 0, max_rows: Optional[int] = None,
+                  col_skip: int = 1) -> TemplateDataset:
+    """
+    Reads a template file into a dataset, skipping the specified number of
+    preamble rows before the header row. As with skip_rows, empty data rows
+    (ignoring the first col_skip columns) are left out, and string values are
+    normalized. A TemplateReadError is raised as soon as there are more than
+    max_rows data rows, without reading the rest of the file.
+    """
+
+    # There are only two file types accepted; .xlsx and .csv
+    rows: Iterable[Sequence] = iter_template_rows(template_file, xlsx=file_name.endswith("xlsx"))
+    row_number = 0
+
+    for row_number, _ in zip(range(1, preamble_rows + 1), rows):
+        pass
+
+    header = next(iter(rows), None)
+    if header is None or row_number < preamble_rows:
+        raise TemplateReadError("Template is missing its header row")
+
+    # Trailing empty header cells are not columns
+    header = list(header)
+    while header and header[-1] in (None, ""):
+        header.pop()
+
+    dataset = TemplateDataset(headers=header)
+
+    for row_number, row in enumerate(rows, start=preamble_rows + 2):
+        if _is_empty(row, col_skip):
+            continue
+
+        if max_rows is not None and dataset.height >= max_rows:
+            raise TemplateReadError(f"Template has more than {max_rows} rows")
+
+        dataset.append(_data_row(row, len(header), row_number))
+
+    return dataset
@@ -0,0 +1,114 @@
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from ..caching import bump_table_versions, cached_for_tables, conditional_for_tables, get_table_versions
+from ..models import Container, Individual, Sample, SampleKind
+from ..resources._bulk import BulkWriter
+from ..viewsets import SampleViewSet
+from .constants import create_individual, create_sample, create_sample_container
+
+
+def run_on_commit_callbacks():
+    # Test cases never commit; run what would have run once the transaction committed
+    callbacks, connection.run_on_commit = connection.run_on_commit, []
+    for _, callback in callbacks:
+        callback()
+
+
+class CachingTestCase(TestCase):
+    def test_table_versions(self):
+        versions = get_table_versions((Container, Sample))
+        self.assertEqual(get_table_versions((Container, Sample)), versions)
+
+        bump_table_versions(Sample)
+        new_versions = get_table_versions((Container, Sample))
+        self.assertEqual(new_versions[0], versions[0])
+        self.assertNotEqual(new_versions[1], versions[1])
+
+    def test_cached_for_tables(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return len(calls)
+
+        self.assertEqual(cached_for_tables("test", (Sample,), compute), 1)
+        self.assertEqual(cached_for_tables("test", (Sample,), compute), 1)
+
+        bump_table_versions(Container)
+        self.assertEqual(cached_for_tables("test", (Sample,), compute), 1)
+
+        bump_table_versions(Sample)
+        self.assertEqual(cached_for_tables("test", (Sample,), compute), 2)
+
+    def test_conditional_for_tables(self):
+        calls = []
+
+        class View:
+            @conditional_for_tables(Sample)
+            def get(self, request):
+                calls.append(1)
+                return HttpResponse(b"[]", content_type="application/json")
+
+        factory = RequestFactory()
+
+        response = View().get(factory.get("/samples/summary/"))
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+
+        # Matching requests are answered without running the view
+        response = View().get(factory.get("/samples/summary/", HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(calls), 1)
+
+        bump_table_versions(Sample)
+        response = View().get(factory.get("/samples/summary/", HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(len(calls), 2)
+
+    def test_sample_summary_invalidation(self):
+        user = User.objects.create_user("jdoe", password="password")
+
+        def get_summary():
+            request = APIRequestFactory().get("/samples/summary/")
+            force_authenticate(request, user=user)
+            return SampleViewSet.as_view({"get": "summary"})(request).data
+
+        individual = Individual.objects.create(**create_individual(individual_name="jdoe"))
+        container = Container.objects.create(**create_sample_container(kind="tube", name="tube001",
+                                                                       barcode="tube001"))
+        sample_kind, _ = SampleKind.objects.get_or_create(name="BLOOD")
+        sample = Sample.objects.create(**create_sample(sample_kind, individual, container))
+        run_on_commit_callbacks()
+
+        summary = get_summary()
+        self.assertEqual(summary["total_count"], 1)
+        self.assertEqual(summary["collection_site_counts"], {"Site1": 1})
+
+        # Rows written without the summary being invalidated are not counted
+        Sample.objects.filter(pk=sample.pk).update(collection_site="Site2")
+        self.assertEqual(get_summary(), summary)
+
+        # Saves
+        sample.collection_site = "Site3"
+        sample.save()
+        run_on_commit_callbacks()
+        self.assertEqual(get_summary()["collection_site_counts"], {"Site3": 1})
+
+        # Bulk updates
+        sample.current_volume = Decimal("100")
+        writer = BulkWriter(dry_run=False)
+        writer.stage_update(sample, ("current_volume",))
+        writer.flush()
+        run_on_commit_callbacks()
+        self.assertEqual(get_summary()["total_volume"], Decimal("100"))
+
+        # Deletes
+        sample.delete()
+        run_on_commit_callbacks()
+        self.assertEqual(get_summary()["total_count"], 0)
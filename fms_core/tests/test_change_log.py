@@ -0,0 +1,108 @@
+import reversion
+
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from io import StringIO
+from pathlib import Path
+from rest_framework.test import APIRequestFactory, force_authenticate
+from tablib import Dataset
+
+from ..models import FieldChange, Individual, Sample
+from ..resources import ContainerResource, ExtractionResource, SampleResource
+from ..viewsets import FieldChangeViewSet
+from .constants import create_individual
+
+
+APP_DATA_ROOT = Path(__file__).parent.parent / "example_data" / "csv"
+CONTAINERS_CSV = APP_DATA_ROOT / "containers.csv"
+SAMPLES_CSV = APP_DATA_ROOT / "samples.csv"
+EXTRACTIONS_CSV = APP_DATA_ROOT / "extractions.csv"
+
+
+class ChangeLogTestCase(TestCase):
+    def setUp(self) -> None:
+        with reversion.create_revision():
+            self.individual = Individual.objects.create(**create_individual(individual_name="jdoe"))
+
+        with reversion.create_revision():
+            self.individual.cohort = "cohort1"
+            self.individual.pedigree = "pedigree1"
+            self.individual.save()
+
+    def assert_changes_logged(self):
+        changes = FieldChange.objects.filter(object_id=str(self.individual.id)).order_by("field")
+        self.assertEqual([(c.field, c.old_value, c.new_value) for c in changes], [
+            ("cohort", "covid-19", "cohort1"),
+            ("pedigree", "", "pedigree1"),
+        ])
+        self.assertEqual(changes[0].date, changes[0].revision.date_created)
+
+    def test_revision_changes(self):
+        self.assert_changes_logged()
+
+    def test_backfill(self):
+        FieldChange.objects.all().delete()
+        call_command("backfill_field_changes", stdout=StringIO())
+        self.assert_changes_logged()
+
+        # Versions which already have changes logged are skipped
+        call_command("backfill_field_changes", stdout=StringIO())
+        self.assertEqual(FieldChange.objects.count(), 2)
+
+        # Interrupted runs are resumed after the last version processed
+        version_pks = sorted(FieldChange.objects.values_list("version_id", flat=True).distinct())
+        FieldChange.objects.all().delete()
+        call_command("backfill_field_changes", since_pk=version_pks[-1], stdout=StringIO())
+        self.assertEqual(FieldChange.objects.count(), 0)
+        call_command("backfill_field_changes", since_pk=version_pks[-1] - 1, stdout=StringIO())
+        self.assert_changes_logged()
+
+    def test_bulk_import_changes(self):
+        for resource_class, path in ((ContainerResource, CONTAINERS_CSV), (SampleResource, SAMPLES_CSV),
+                                     (ExtractionResource, EXTRACTIONS_CSV)):
+            with reversion.create_revision():
+                resource_class().import_data(Dataset().load(path.read_text()), raise_errors=True)
+                reversion.set_comment(f"Loaded {path.name}")
+
+        # Versions saved by bulk imports are logged too; nothing is logged for new objects
+        sample = Sample.objects.get(name="sample1")
+        changes = {c.field: c for c in FieldChange.objects.filter(object_id=str(sample.id))}
+        self.assertLessEqual({"current_volume", "volume_history"}, changes.keys())
+
+        volume_change = changes["current_volume"]
+        self.assertEqual(Decimal(volume_change.old_value) - Decimal(volume_change.new_value), 1)
+        self.assertEqual(volume_change.revision.comment, "Loaded extractions.csv")
+        self.assertEqual(volume_change.date, volume_change.revision.date_created)
+        self.assertEqual(volume_change.version.revision_id, volume_change.revision_id)
+
+    def test_field_change_viewset(self):
+        with reversion.create_revision():
+            self.individual.cohort = "cohort2"
+            self.individual.save()
+
+        # The first cohort change was made a while ago
+        FieldChange.objects.filter(field="cohort", new_value="cohort1").update(date=timezone.now() - timedelta(days=10))
+
+        user = User.objects.create_user("jdoe", password="password")
+
+        def list_changes(params):
+            request = APIRequestFactory().get("/field-changes/", params)
+            force_authenticate(request, user=user)
+            response = FieldChangeViewSet.as_view({"get": "list"})(request)
+            return [(c["field"], c["old_value"], c["new_value"]) for c in response.data["results"]]
+
+        week_ago = (timezone.now() - timedelta(days=7)).date().isoformat()
+        self.assertListEqual(list_changes({"field": "cohort", "date__gte": week_ago}), [
+            ("cohort", "cohort1", "cohort2"),
+        ])
+        self.assertListEqual(list_changes({"field": "cohort"}), [
+            ("cohort", "cohort1", "cohort2"),
+            ("cohort", "covid-19", "cohort1"),
+        ])
+        self.assertListEqual(list_changes({"field__in": "cohort,pedigree", "date__lt": week_ago}), [
+            ("cohort", "covid-19", "cohort1"),
+        ])
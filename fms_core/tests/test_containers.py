@@ -1,7 +1,17 @@
+import json
+
 from django.test import TestCase
 
-from ..coordinates import alphas, ints
-from ..containers import CONTAINER_SPEC_96_WELL_PLATE, CONTAINER_SPEC_ROOM
+from ..coordinates import CoordinateError, alphas, ints
+from ..containers import (
+    ContainerSpec,
+    CONTAINER_SPEC_96_WELL_PLATE,
+    CONTAINER_SPEC_ROOM,
+    CONTAINER_SPEC_TUBE,
+    CONTAINER_KIND_CHILDREN,
+    CONTAINER_KIND_PARENTS,
+    CONTAINER_KINDS_JSON,
+)
 
 
 class AdminUtilsTestCase(TestCase):
@@ -19,3 +29,27 @@ class AdminUtilsTestCase(TestCase):
         })
 
         self.assertTrue(CONTAINER_SPEC_ROOM.is_source)
+
+    def test_container_spec_kinds(self):
+        self.assertTrue(CONTAINER_SPEC_ROOM.can_hold_kind("room"))
+        self.assertTrue(CONTAINER_SPEC_ROOM.can_hold_kind("tube"))
+        self.assertFalse(CONTAINER_SPEC_TUBE.can_hold_kind("tube"))
+
+        for spec in ContainerSpec.container_specs:
+            self.assertSetEqual(CONTAINER_KIND_CHILDREN[spec.container_kind_id],
+                                {c.container_kind_id for c in spec.children})
+            self.assertSetEqual(CONTAINER_KIND_PARENTS[spec.container_kind_id],
+                                {p.container_kind_id for p in ContainerSpec.container_specs
+                                 if p.can_hold_kind(spec.container_kind_id)})
+
+        self.assertEqual(len(json.loads(CONTAINER_KINDS_JSON)), len(ContainerSpec.container_specs))
+
+    def test_container_spec_coordinates(self):
+        self.assertEqual(CONTAINER_SPEC_96_WELL_PLATE.validate_and_normalize_coordinates(" A01"), "A01")
+        self.assertListEqual(CONTAINER_SPEC_96_WELL_PLATE.validate_many(("A01", "H12")), ["A01", "H12"])
+
+        with self.assertRaises(CoordinateError):
+            CONTAINER_SPEC_96_WELL_PLATE.validate_and_normalize_coordinates("A1")
+
+        with self.assertRaises(CoordinateError):
+            CONTAINER_SPEC_96_WELL_PLATE.validate_many(("A01", "A13"))
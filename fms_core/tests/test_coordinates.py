@@ -1,5 +1,5 @@
 from django.test import TestCase
-from ..coordinates import CoordinateError, alphas, ints, validate_and_normalize_coordinates
+from ..coordinates import CoordinateError, alphas, ints, get_coordinate_validator, validate_and_normalize_coordinates
 
 
 class CoordinateTestCase(TestCase):
@@ -70,3 +70,19 @@ class CoordinateTestCase(TestCase):
         for iv in ("1A", "I12", "A13", "CC", "231", "  "):
             with self.assertRaises(CoordinateError):
                 validate_and_normalize_coordinates(iv, cs)
+
+    def test_validator_cached(self):
+        cs = (alphas(8), ints(12, pad_to=2))
+        self.assertIs(get_coordinate_validator(cs), get_coordinate_validator((alphas(8), ints(12, pad_to=2))))
+
+    def test_validate_many(self):
+        v = get_coordinate_validator((alphas(8), ints(12)))
+        self.assertListEqual(v.validate_many((" A1", "H12 ", "B3")), ["A1", "H12", "B3"])
+        self.assertListEqual(v.validate_many(()), [])
+
+        with self.assertRaises(CoordinateError):
+            try:
+                v.validate_many(("A1", "I12", "A13"))
+            except CoordinateError as e:
+                self.assertIn("I12, A13", str(e))
+                raise e
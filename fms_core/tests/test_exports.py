@@ -0,0 +1,51 @@
+from django.test import TestCase
+from io import BytesIO
+from openpyxl import load_workbook
+from types import SimpleNamespace
+
+from ..exports import StreamingExportMixin, XLSXRenderer, export_labels
+from ..models import Individual
+from ..serializers import IndividualSerializer
+from .constants import create_individual
+
+
+def get_rows(xlsx_bytes: bytes) -> list:
+    return [list(r) for r in load_workbook(BytesIO(xlsx_bytes)).active.iter_rows(values_only=True)]
+
+
+class ExportsTestCase(TestCase):
+    def setUp(self) -> None:
+        for name in ("jdoe", "asmith"):
+            Individual.objects.create(**create_individual(individual_name=name))
+
+    def export(self, export_format: str):
+        request = SimpleNamespace(accepted_renderer=SimpleNamespace(format=export_format))
+        mixin = StreamingExportMixin()
+        mixin.export_chunk_size = 1
+        return mixin.export_response(request, Individual.objects.order_by("name"), IndividualSerializer,
+                                     "individuals", labels=export_labels(("name", "taxon")))
+
+    def test_csv_export(self):
+        response = self.export("csv")
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="individuals.csv"')
+
+        lines = b"".join(response.streaming_content).decode("utf-8").splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].startswith("id,Name,Taxon,"))
+        self.assertIn(",asmith,Homo sapiens,", lines[1])
+        self.assertIn(",jdoe,Homo sapiens,", lines[2])
+
+    def test_xlsx_export(self):
+        response = self.export("xlsx")
+        self.assertIn('filename="individuals.xlsx"', response["Content-Disposition"])
+
+        rows = get_rows(b"".join(response.streaming_content))
+        self.assertEqual(rows[0][:3], ["id", "Name", "Taxon"])
+        self.assertEqual([r[1] for r in rows[1:]], ["asmith", "jdoe"])
+
+    def test_other_formats(self):
+        self.assertIsNone(self.export("json"))
+
+    def test_xlsx_error(self):
+        rows = get_rows(XLSXRenderer().render({"detail": "Not found."}))
+        self.assertEqual(rows, [["detail", "Not found."]])
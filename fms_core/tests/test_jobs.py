@@ -0,0 +1,155 @@
+import os
+import tempfile
+import time
+
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.utils import timezone
+from pathlib import Path
+from rest_framework.test import APIRequestFactory, force_authenticate
+from unittest import mock
+
+from ..jobs import (
+    STALE_JOB_TIMEOUT,
+    TEMPLATE_CHECK_TIMEOUT,
+    check_template,
+    claim_import_job,
+    get_checked_template,
+    queue_checked_import_job,
+    queue_import_job,
+    run_import_job,
+)
+from ..models import Container, ImportJob, Sample
+from ..resources import ContainerResource, SampleResource
+from ..viewsets import ImportJobViewSet
+
+
+APP_DATA_ROOT = Path(__file__).parent.parent / "example_data" / "csv"
+CONTAINERS_CSV = APP_DATA_ROOT / "containers.csv"
+SAMPLES_CSV = APP_DATA_ROOT / "samples.csv"
+
+
+def get_template(path: Path) -> SimpleUploadedFile:
+    return SimpleUploadedFile(path.name, path.read_bytes(), content_type="text/csv")
+
+
+class ImportJobsTestCase(TestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create_user("jdoe", password="password")
+        self.other_user = User.objects.create_user("asmith", password="password")
+
+        uploads = tempfile.TemporaryDirectory()
+        self.addCleanup(uploads.cleanup)
+        self.uploads_path = Path(uploads.name)
+        patcher = mock.patch("fms_core.jobs.UPLOADS_PATH", uploads.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_import_job(self):
+        job = queue_import_job(get_template(CONTAINERS_CSV), ContainerResource, self.user)
+        self.assertEqual(job.status, ImportJob.STATUS_QUEUED)
+
+        claimed = claim_import_job()
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual(claimed.status, ImportJob.STATUS_RUNNING)
+        self.assertIsNotNone(claimed.heartbeat)
+        self.assertIsNone(claim_import_job())
+
+        run_import_job(claimed)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.STATUS_SUCCEEDED)
+        self.assertTrue(job.result["valid"])
+        self.assertEqual(job.total_rows, 6)
+        self.assertEqual(job.processed_rows, 6)
+        self.assertIsNotNone(job.finished)
+        self.assertEqual(Container.objects.count(), 6)
+
+    def test_failed_import_job(self):
+        # Importing the same containers twice fails, and nothing is saved by the failed job
+        for _ in range(2):
+            queue_import_job(get_template(CONTAINERS_CSV), ContainerResource, self.user)
+            run_import_job(claim_import_job())
+
+        jobs = ImportJob.objects.order_by("id")
+        self.assertListEqual([j.status for j in jobs], [ImportJob.STATUS_SUCCEEDED, ImportJob.STATUS_FAILED])
+        self.assertFalse(jobs[1].result["valid"])
+        self.assertEqual(Container.objects.count(), 6)
+
+    def test_stale_import_job(self):
+        job = queue_import_job(get_template(CONTAINERS_CSV), ContainerResource, self.user)
+        claim_import_job()
+
+        # Running jobs are only claimed again once their worker has stopped reporting
+        ImportJob.objects.filter(pk=job.pk).update(heartbeat=timezone.now() - timedelta(seconds=60))
+        self.assertIsNone(claim_import_job())
+
+        ImportJob.objects.filter(pk=job.pk).update(
+            heartbeat=timezone.now() - timedelta(seconds=STALE_JOB_TIMEOUT + 1))
+        self.assertEqual(claim_import_job().pk, job.pk)
+
+    def test_checked_import_job(self):
+        queue_import_job(get_template(CONTAINERS_CSV), ContainerResource, self.user)
+        run_import_job(claim_import_job())
+
+        token, result = check_template(get_template(SAMPLES_CSV), SampleResource, self.user)
+        self.assertTrue(result["valid"])
+
+        # Checks can only be submitted by the user who ran them
+        self.assertIsNone(get_checked_template(token, SampleResource, self.other_user))
+        self.assertIsNone(queue_checked_import_job(token, SampleResource, self.other_user))
+        self.assertIsNotNone(get_checked_template(token, SampleResource, self.user)["lookups"])
+
+        job = queue_checked_import_job(token, SampleResource, self.user)
+        self.assertEqual(job.check_token, token)
+
+        restored_lookups = []
+        restore_lookups = SampleResource.restore_lookups
+
+        def restore(resource):
+            restored_lookups.append(restore_lookups(resource))
+            return restored_lookups[-1]
+
+        # The dataset parsed and the lookups resolved by the check are re-used
+        with mock.patch("fms_core.jobs.load_template_dataset", side_effect=AssertionError("Template parsed again")), \
+                mock.patch.object(SampleResource, "restore_lookups", restore):
+            run_import_job(claim_import_job())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.STATUS_SUCCEEDED, job.result)
+        self.assertListEqual(restored_lookups, [True])
+        self.assertEqual(Sample.objects.count(), 4)
+
+    def test_expired_check_file(self):
+        token, _ = check_template(get_template(CONTAINERS_CSV), ContainerResource, self.user)
+
+        # Checked templates are kept on disk rather than in the cache
+        check_file = self.uploads_path / "checks" / f"{token}.csv"
+        self.assertEqual(check_file.read_bytes(), CONTAINERS_CSV.read_bytes())
+
+        expired = time.time() - TEMPLATE_CHECK_TIMEOUT - 1
+        os.utime(check_file, (expired, expired))
+
+        # Files of expired checks are removed when another template is checked
+        check_template(get_template(SAMPLES_CSV), SampleResource, self.user)
+        self.assertFalse(check_file.exists())
+        self.assertIsNone(queue_checked_import_job(token, ContainerResource, self.user))
+
+    def test_import_job_viewset(self):
+        queue_import_job(get_template(CONTAINERS_CSV), ContainerResource, self.user)
+        queue_import_job(get_template(CONTAINERS_CSV), ContainerResource, self.other_user)
+
+        def list_jobs(user):
+            request = APIRequestFactory().get("/import-jobs/")
+            force_authenticate(request, user=user)
+            response = ImportJobViewSet.as_view({"get": "list"})(request)
+            return [j["created_by"] for j in response.data["results"]]
+
+        # Users other than staff only see their own jobs
+        self.assertListEqual(list_jobs(self.user), [self.user.pk])
+
+        self.user.is_staff = True
+        self.user.save()
+        self.assertListEqual(list_jobs(self.user), [self.other_user.pk, self.user.pk])
@@ -1,8 +1,11 @@
 from decimal import Decimal
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.test import TestCase
+from unittest import mock
 from ..containers import NON_SAMPLE_CONTAINER_KINDS
 from ..models import Container, Sample, Individual, SampleKind
+# noinspection PyProtectedMember
+from ..models._validation import validation_context
 from .constants import (
     create_container,
     create_individual,
@@ -35,6 +38,88 @@ class ContainerTest(TestCase):
                 self.assertIn("coordinates", e.message_dict)
                 raise e
 
+    def test_same_coordinates_validation_context(self):
+        rack = Container.objects.create(**create_container(barcode='R123456'))
+        Container.objects.create(**create_container(location=rack, barcode='R123457', coordinates="A01", kind="tube",
+                                                    name="tube01"))
+        with validation_context():
+            # Collisions with both existing containers and containers saved within the context are caught
+            Container.objects.create(**create_container(location=rack, barcode='R123458', coordinates="A02",
+                                                        kind="tube", name="tube02"))
+            for coordinates in ("A01", "A02"):
+                with self.assertRaises(ValidationError):
+                    try:
+                        Container.objects.create(**create_container(location=rack, barcode='R123459',
+                                                                    coordinates=coordinates, kind="tube",
+                                                                    name="tube03"))
+                    except ValidationError as e:
+                        self.assertIn("coordinates", e.message_dict)
+                        raise e
+
+    def test_clean_validation_context(self):
+        rack = Container.objects.create(**create_container(barcode='R123456'))
+        tube = Container.objects.create(**create_container(location=rack, barcode='R123457', coordinates="A01",
+                                                           kind="tube", name="tube01"))
+        tube = Container.objects.get(pk=tube.pk)
+
+        with validation_context() as context:
+            context.add_objects((rack,))
+            context.overlap_index(Container, "location").preload((rack.pk,))
+
+            # The location is taken from the context rather than fetched
+            with self.assertNumQueries(0):
+                tube.clean()
+            self.assertIs(tube.location, rack)
+
+    def test_get_ancestors(self):
+        room = Container.objects.create(kind="room", name="Room01", barcode="Room01")
+        freezer = Container.objects.create(kind="freezer 3 shelves", name="Freezer01", barcode="Freezer01",
+                                           location=room)
+        rack = Container.objects.create(kind="freezer rack 4x4", name="FreezerRack01", barcode="FreezerRack01",
+                                        location=freezer, coordinates="A01")
+
+        with self.assertNumQueries(1):
+            ancestors = Container.get_ancestors((room.pk, freezer.pk, rack.pk))
+
+        self.assertListEqual(ancestors[room.pk], [])
+        self.assertListEqual([c.barcode for c in ancestors[freezer.pk]], ["Room01"])
+        self.assertListEqual([c.barcode for c in ancestors[rack.pk]], ["Room01", "Freezer01"])
+
+        # Ancestries are cut off past the maximum depth, keeping the closest ancestors
+        with mock.patch("fms_core.models.container.MAX_CONTAINER_DEPTH", 1):
+            self.assertListEqual([c.barcode for c in Container.get_ancestors((rack.pk,))[rack.pk]], ["Freezer01"])
+
+    def test_path(self):
+        room = Container.objects.create(kind="room", name="Room01", barcode="Room01")
+        freezer = Container.objects.create(kind="freezer 3 shelves", name="Freezer01", barcode="Freezer01",
+                                           location=room)
+        rack = Container.objects.create(kind="freezer rack 4x4", name="FreezerRack01", barcode="FreezerRack01",
+                                        location=freezer, coordinates="A01")
+        self.assertEqual(room.path, "/")
+        self.assertEqual(rack.path, f"/{room.pk}/{freezer.pk}/")
+
+        # Moving a container re-roots the paths of its descendants
+        room2 = Container.objects.create(kind="room", name="Room02", barcode="Room02")
+        freezer.location = room2
+        freezer.save()
+        rack.refresh_from_db()
+        self.assertEqual(rack.path, f"/{room2.pk}/{freezer.pk}/")
+        self.assertListEqual(
+            list(Container.objects.filter(path__startswith=room2.subtree_path).values_list("barcode", flat=True)
+                 .order_by("barcode")),
+            ["Freezer01", "FreezerRack01"])
+
+        # Containers cannot be moved inside of their own descendants
+        room3 = Container.objects.create(kind="room", name="Room03", barcode="Room03", location=room2)
+        room2.refresh_from_db()
+        room2.location = room3
+        with self.assertRaises(ValidationError):
+            try:
+                room2.full_clean()
+            except ValidationError as e:
+                self.assertIn("location", e.message_dict)
+                raise e
+
     def test_non_existent_parent(self):
         with self.assertRaises(ObjectDoesNotExist):
             Container.objects.create(**create_container(
@@ -100,6 +185,7 @@ class SampleTest(TestCase):
         self.assertEqual(Sample.objects.count(), 1)
         self.assertEqual(sample.is_depleted, "no")
         self.assertEqual(sample.volume, Decimal("5000.000"))
+        self.assertEqual(Sample.objects.filter(current_volume__gte=Decimal("5000")).count(), 1)
         self.assertEqual(sample.individual_name, "jdoe")
         self.assertEqual(sample.individual_sex, Individual.SEX_UNKNOWN)
         self.assertEqual(sample.individual_taxon, Individual.TAXON_HOMO_SAPIENS)
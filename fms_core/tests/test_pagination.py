@@ -0,0 +1,99 @@
+from django.test import TestCase
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from ..models import Individual
+from ..pagination import KeysetPagination
+from .constants import create_individual
+
+
+class KeysetPaginationTestCase(TestCase):
+    def setUp(self) -> None:
+        self.factory = APIRequestFactory()
+
+        mother = Individual.objects.create(**create_individual(individual_name="mother"))
+        for i in range(6):
+            Individual.objects.create(**create_individual(
+                individual_name=f"individual{i}",
+                cohort=f"cohort{i % 2}",
+                mother=mother if i % 3 == 0 else None,
+            ))
+
+    def walk(self, ordering, limit=2):
+        pages = []
+        params = {"cursor": "", "limit": limit}
+
+        while True:
+            pagination = KeysetPagination()
+            request = Request(self.factory.get("/individuals/", params))
+            page = pagination.paginate_queryset(Individual.objects.order_by(*ordering), request)
+            response = pagination.get_paginated_response([i.name for i in page])
+
+            self.assertNotIn("count", response.data)
+            pages.append(response.data["results"])
+
+            if response.data["next"] is None:
+                return pages
+            params["cursor"] = pagination.next_cursor
+
+    def test_keyset_pages(self):
+        for ordering in (("name",), ("-cohort",), ("cohort", "-name"), ("mother",), ("-mother", "-id")):
+            pages = self.walk(ordering)
+            expected = list(Individual.objects.order_by(*ordering, "pk").values_list("name", flat=True))
+
+            self.assertEqual([name for page in pages for name in page], expected)
+            self.assertEqual(len(pages), 4)
+
+    def test_offset_pages(self):
+        pagination = KeysetPagination()
+        request = Request(self.factory.get("/individuals/", {"limit": 2, "offset": 2}))
+        page = pagination.paginate_queryset(Individual.objects.order_by("name"), request)
+        response = pagination.get_paginated_response([i.name for i in page])
+
+        self.assertEqual(response.data["count"], 7)
+        self.assertFalse(response.data["count_estimated"])
+        self.assertEqual(response.data["results"], ["individual2", "individual3"])
+
+    def test_invalid_cursor(self):
+        for cursor in ("not a cursor", KeysetPagination.encode_cursor([1, 2, 3])):
+            request = Request(self.factory.get("/individuals/", {"cursor": cursor}))
+            with self.assertRaises(NotFound):
+                KeysetPagination().paginate_queryset(Individual.objects.order_by("name"), request)
+
+    def test_count_queries(self):
+        def paginate(params):
+            pagination = KeysetPagination()
+            request = Request(self.factory.get("/individuals/", params))
+            pagination.paginate_queryset(Individual.objects.order_by("name"), request)
+            return pagination
+
+        # The count is known from the last page itself
+        with self.assertNumQueries(1):
+            self.assertEqual(paginate({"limit": 10}).count, 7)
+
+        # Otherwise rows are counted up to the threshold
+        with self.settings(FMS_EXACT_COUNT_THRESHOLD=7), self.assertNumQueries(2):
+            pagination = paginate({"limit": 2})
+            self.assertEqual(pagination.count, 7)
+            self.assertFalse(pagination.count_estimated)
+
+    def test_estimated_count(self):
+        with self.settings(FMS_EXACT_COUNT_THRESHOLD=0):
+            pagination = KeysetPagination()
+            request = Request(self.factory.get("/individuals/", {"limit": 2}))
+            page = pagination.paginate_queryset(Individual.objects.order_by("name"), request)
+            response = pagination.get_paginated_response([i.name for i in page])
+
+            self.assertTrue(response.data["count_estimated"])
+            self.assertGreaterEqual(response.data["count"], 3)
+            self.assertIsNotNone(response.data["next"])
+
+            # The count is exact once the last page is reached
+            request = Request(self.factory.get("/individuals/", {"limit": 2, "offset": 6}))
+            page = pagination.paginate_queryset(Individual.objects.order_by("name"), request)
+            response = pagination.get_paginated_response([i.name for i in page])
+
+            self.assertFalse(response.data["count_estimated"])
+            self.assertEqual(response.data["count"], 7)
+            self.assertIsNone(response.data["next"])
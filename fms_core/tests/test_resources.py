@@ -1,7 +1,8 @@
+import pickle
 import reversion
 from decimal import Decimal
 from django.core.exceptions import ValidationError
-from django.db import IntegrityError, transaction
+from django.db import IntegrityError, connection, transaction
 from django.test import TestCase
 from pathlib import Path
 from reversion.models import Version
@@ -17,6 +18,8 @@ from ..resources import (
     SampleUpdateResource,
 )
 # noinspection PyProtectedMember
+from ..resources._lookups import LookupCache
+# noinspection PyProtectedMember
 from ..resources._utils import skip_rows
 
 
@@ -31,6 +34,13 @@ def get_ds():
     return ds
 
 
+def get_sequence_value(model):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_sequence_last_value(pg_get_serial_sequence(%s, %s)::regclass)",
+                       [model._meta.db_table, model._meta.pk.column])
+        return cursor.fetchone()[0] or 0  # NULL until the sequence is first used
+
+
 CSV_1 = """#,good 1,good 2,good 3
 1,v1,v2,v3
 """
@@ -93,6 +103,38 @@ class ResourcesTestCase(TestCase):
         skip_rows(ds, num_rows=2, col_skip=1)
         self.assertEqual(ds.export("csv").replace("\r", ""), CSV_1)
 
+    def test_lookup_cache(self):
+        self.load_containers()
+
+        cache = LookupCache(Container.objects.all(), "barcode")
+        cache.prefetch(("box001", "tube001", "does_not_exist"))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(cache.get("box001").name, "original_box")
+            with self.assertRaises(Container.DoesNotExist):
+                cache.get("does_not_exist")
+
+            tube, created = cache.get_or_create(barcode="tube001", name="sample1_tube", kind="tube",
+                                                location=cache.get("box001"))
+            self.assertFalse(created)
+            self.assertEqual(tube.barcode, "tube001")
+
+    def test_lookup_cache_pickle(self):
+        self.load_containers()
+
+        cache = LookupCache(Container.objects.all(), "barcode")
+        cache.prefetch(("box001", "does_not_exist"))
+
+        # Pickling must not evaluate the underlying queryset
+        with self.assertNumQueries(0):
+            restored = pickle.loads(pickle.dumps(cache))
+            self.assertEqual(restored.get("box001").name, "original_box")
+            with self.assertRaises(Container.DoesNotExist):
+                restored.get("does_not_exist")
+
+        with self.assertNumQueries(1):
+            self.assertEqual(restored.get("tube001").barcode, "tube001")
+
     def test_container_import(self):
         self.load_containers()
         self.assertEqual(len(Container.objects.all()), 6)
@@ -114,6 +156,42 @@ class ResourcesTestCase(TestCase):
         self.assertEqual(i.pedigree, i.father.pedigree)
         self.assertEqual(i.cohort, i.father.cohort)
 
+    def test_sample_import_versions(self):
+        self.load_samples()
+
+        # New samples, containers and individuals are versioned under a single revision
+        sample_versions = Version.objects.get_for_model(Sample)
+        individual_versions = Version.objects.get_for_model(Individual)
+        self.assertEqual(sample_versions.count(), 4)
+        self.assertEqual(individual_versions.count(), 6)
+        self.assertEqual(len({v.revision_id for v in (*sample_versions, *individual_versions)}), 1)
+
+    def test_sample_import_dry_run(self):
+        self.load_containers()
+        sequence_values = [get_sequence_value(m) for m in (Sample, Individual, Container)]
+
+        with open(SAMPLES_CSV) as sf:
+            s = Dataset().load(sf.read())
+            result = self.sr.import_data(s, dry_run=True)
+
+        self.assertFalse(result.has_errors() or result.has_validation_errors())
+        self.assertEqual(Sample.objects.count(), 0)
+        self.assertEqual(Individual.objects.count(), 0)
+
+        # No primary key is reserved on dry runs
+        self.assertListEqual([get_sequence_value(m) for m in (Sample, Individual, Container)], sequence_values)
+
+    def test_sample_import_reserved_ids(self):
+        self.load_containers()
+        sequence_values = [get_sequence_value(m) for m in (Sample, Individual)]
+
+        with open(SAMPLES_CSV) as sf:
+            self.sr.import_data(Dataset().load(sf.read()), raise_errors=True)
+
+        # Keys are reserved as objects are staged, rather than for every row of the template
+        for model, value in zip((Sample, Individual), sequence_values):
+            self.assertLess(get_sequence_value(model) - value, 2 * model.objects.count())
+
     def test_invalid_sample_import(self):
         self.load_containers()
 
@@ -154,6 +232,37 @@ class ResourcesTestCase(TestCase):
         vs = Version.objects.filter(object_id=str(s.id), content_type__model="sample").count()
         self.assertEqual(vs, 2)
 
+    def test_shared_source_extraction_import(self):
+        self.load_samples()
+
+        with reversion.create_revision(), open(EXTRACTIONS_CSV) as ef:
+            # Extract both samples from the same source
+            e = Dataset().load(ef.read().replace("2,RNA,15,tube002,", "2,RNA,5,tube001,"))
+            self.er.import_data(e, raise_errors=True)
+
+        s = Sample.objects.get(container__barcode="tube001")
+        self.assertEqual(s.extractions.count(), 2)
+        self.assertListEqual([v["update_type"] for v in s.volume_history], ["update", "extraction", "extraction"])
+        self.assertEqual(s.volume, Decimal("4"))
+        self.assertEqual(s.current_volume, Decimal("4"))
+        self.assertEqual(s.update_comment, "Extracted sample (imported from template) consumed 6.000 µL.")
+
+        # The source is saved and versioned once
+        vs = Version.objects.filter(object_id=str(s.id), content_type__model="sample").count()
+        self.assertEqual(vs, 2)
+
+    def test_shared_source_over_extraction(self):
+        self.load_samples()
+
+        with open(EXTRACTIONS_CSV) as ef:
+            # The first extraction uses more than the source's volume; the second one is still valid
+            e = Dataset().load(ef.read().replace("1,DNA,1,tube001,", "1,DNA,20,tube001,")
+                               .replace("2,RNA,15,tube002,", "2,RNA,5,tube001,"))
+            result = self.er.import_data(e, dry_run=True)
+
+        self.assertEqual(len(result.invalid_rows), 1)
+        self.assertIn("volume_used", result.invalid_rows[0].field_specific_errors)
+
     def test_first_sample_extraction_import(self):
         self.load_samples_extractions()
 
@@ -234,6 +343,20 @@ class ResourcesTestCase(TestCase):
 
         # TODO: Test leaving coordinate blank not updating container coordinate
 
+    def test_sample_update_resolution(self):
+        self.load_samples()
+
+        # Every (barcode, coordinates) pair is resolved at once
+        with self.assertNumQueries(1):
+            # noinspection PyProtectedMember
+            samples = SampleUpdateResource._resolve_samples((("tube001", ""), ("plate001", "A01"), ("tube001", "")))
+        self.assertEqual(len(samples), 2)
+        self.assertEqual(samples[("plate001", "A01")].container.barcode, "plate001")
+
+        with self.assertRaises(Sample.DoesNotExist):
+            # noinspection PyProtectedMember
+            SampleUpdateResource._resolve_samples((("tube001", ""), ("plate001", "A02")))
+
     def test_container_move(self):
         self.load_containers()
 
@@ -282,6 +405,7 @@ class ResourcesTestCase(TestCase):
             ("rename_invalid.csv", ValidationError),
             ("same_rename.csv", ValidationError),
             ("same_rename_2.csv", ValidationError),
+            ("rename_existing.csv", ValidationError),
             ("double_rename.csv", ValueError),
         ):
             print(f"Testing invalid container rename {f}", flush=True)
@@ -0,0 +1,49 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from ..models import Container, Individual, Sample, SampleKind
+from ..search import SEARCHABLE_MODELS, global_search
+from .constants import create_individual, create_sample, create_sample_container
+
+
+class GlobalSearchTestCase(TestCase):
+    def setUp(self) -> None:
+        self.container = Container.objects.create(**create_sample_container(kind="tube", name="tube01",
+                                                                            barcode="tube01"))
+        Container.objects.create(**create_sample_container(kind="tube", name="tube010", barcode="tube010"))
+        Container.objects.create(**create_sample_container(kind="tube", name="rack01", barcode="rack01"))
+
+        individual = Individual.objects.create(**create_individual(individual_name="tube01_donor"))
+        sample_kind, _ = SampleKind.objects.get_or_create(name="BLOOD")
+        Sample.objects.create(**create_sample(sample_kind, individual, self.container, name="sample_tube01"))
+
+    def test_global_search(self):
+        results = global_search("tube01")
+        models = {result_type: model for result_type, model, _ in SEARCHABLE_MODELS}
+
+        self.assertSetEqual({(r["type"], r["item"].name) for r in results}, {
+            ("container", "tube01"),
+            ("container", "tube010"),
+            ("individual", "tube01_donor"),
+            ("sample", "sample_tube01"),
+        })
+        for r in results:
+            self.assertIsInstance(r["item"], models[r["type"]])
+
+        # Exact matches come first, and results are sorted by decreasing score
+        self.assertEqual((results[0]["type"], results[0]["item"]), ("container", self.container))
+        self.assertListEqual([r["score"] for r in results], sorted((r["score"] for r in results), reverse=True))
+
+        limited = global_search("tube01", limit=2)
+        self.assertListEqual([(r["type"], r["item"].pk) for r in limited],
+                             [(r["type"], r["item"].pk) for r in results[:2]])
+
+    def test_like_wildcards(self):
+        Container.objects.create(**create_sample_container(kind="tube", name="tube_02", barcode="tube_02"))
+        Container.objects.create(**create_sample_container(kind="tube", name="tubex02", barcode="tubex02"))
+        User.objects.create_user("user1", first_name="100%")
+        User.objects.create_user("user2", first_name="1000")
+
+        # Wildcards in search terms are matched literally
+        self.assertListEqual([(r["type"], r["item"].name) for r in global_search("e_0")], [("container", "tube_02")])
+        self.assertListEqual([(r["type"], r["item"].username) for r in global_search("100%")], [("user", "user1")])
@@ -0,0 +1,121 @@
+import reversion
+
+from decimal import Decimal
+from django.test import TestCase
+from django.utils import timezone
+from reversion.models import Version
+
+from ..models import Container, Individual, Sample, SampleKind
+from ..serializers import SampleExportSerializer, VersionSummarySerializer
+from .constants import (
+    create_container,
+    create_extracted_sample,
+    create_individual,
+    create_sample,
+    create_sample_container,
+)
+
+
+class VersionSummarySerializerTestCase(TestCase):
+    def test_changed_fields(self):
+        with reversion.create_revision():
+            individual = Individual.objects.create(**create_individual(individual_name="jdoe"))
+
+        with reversion.create_revision():
+            reversion.set_comment("Updated cohort")
+            individual.cohort = "cohort1"
+            individual.save()
+
+        versions = VersionSummarySerializer.get_summary_queryset(Version.objects.get_for_object(individual))
+        with self.assertNumQueries(2):
+            data = VersionSummarySerializer(versions, many=True).data
+
+        self.assertEqual([v["changed_fields"] for v in data], [["cohort"], None])
+        self.assertEqual(data[0]["comment"], "Updated cohort")
+        self.assertNotIn("serialized_data", data[0])
+
+
+class SampleExportSerializerTestCase(TestCase):
+    def setUp(self) -> None:
+        mother = Individual.objects.create(**create_individual(individual_name="jdoe_mother"))
+        father = Individual.objects.create(**create_individual(individual_name="jdoe_father"))
+        self.individual = Individual.objects.create(**create_individual(individual_name="jdoe", mother=mother,
+                                                                        father=father))
+        self.individual_no_parents = Individual.objects.create(**create_individual(individual_name="asmith"))
+
+        rack = Container.objects.create(**create_container(barcode="R123456"))
+        tube = Container.objects.create(**create_sample_container(kind="tube", name="TestTube01", barcode="T123456"))
+        rack_tube = Container.objects.create(**create_sample_container(kind="tube", name="TestTube02",
+                                                                       barcode="T223456", location=rack,
+                                                                       coordinates="C03"))
+
+        blood, _ = SampleKind.objects.get_or_create(name="BLOOD")
+        dna, _ = SampleKind.objects.get_or_create(name="DNA")
+
+        self.sample = Sample.objects.create(**create_sample(blood, self.individual, tube, name="sample01"))
+        self.extracted_sample = Sample.objects.create(**create_extracted_sample(
+            dna, self.individual_no_parents, rack_tube, self.sample, Decimal("1"), name="sample02",
+            tissue_source=Sample.TISSUE_SOURCE_BLOOD))
+
+    def test_export_queryset(self):
+        today = timezone.localdate()
+        common = {
+            "individual__taxon": Individual.TAXON_HOMO_SAPIENS,
+            "individual__sex": Individual.SEX_UNKNOWN,
+            "individual__cohort": "covid-19",
+            "individual__pedigree": "",
+            "container__kind": "tube",
+            "collection_site": "Site1",
+            "creation_date": today,
+            "phenotype": "",
+            "depleted": False,
+            "coordinates": "",
+            "comment": "",
+        }
+
+        rows = SampleExportSerializer.get_export_queryset(Sample.objects.order_by("name"))
+        with self.assertNumQueries(1):
+            rows = list(rows)
+
+        self.assertListEqual(rows, [
+            {
+                **common,
+                "sample_kind__name": "BLOOD",
+                "name": "sample01",
+                "alias": "53",
+                "container__name": "TestTube01",
+                "container__barcode": "T123456",
+                "container__coordinates": "",
+                "individual__name": "jdoe",
+                "current_volume": Decimal("5000.000"),
+                "concentration": None,
+                "tissue_source": "",
+                "location_barcode": "",
+                "mother_name": "jdoe_mother",
+                "father_name": "jdoe_father",
+            },
+            {
+                **common,
+                "sample_kind__name": "DNA",
+                "name": "sample02",
+                "alias": "12",
+                "container__name": "TestTube02",
+                "container__barcode": "T223456",
+                "container__coordinates": "C03",
+                "individual__name": "asmith",
+                "current_volume": Decimal("0.000"),
+                "concentration": Decimal("0.010"),
+                "tissue_source": Sample.TISSUE_SOURCE_BLOOD,
+                "location_barcode": "R123456",
+                "mother_name": "",
+                "father_name": "",
+            },
+        ])
+
+        data = SampleExportSerializer(rows, many=True).data
+        self.assertListEqual(list(data[0].keys()), list(SampleExportSerializer.Meta.fields))
+        self.assertEqual(data[0]["location_barcode"], "")
+        self.assertEqual(data[1]["location_barcode"], "R123456")
+        self.assertEqual(data[1]["individual_id"], "asmith")
+        self.assertEqual(data[1]["current_volume"], "0.000")
+        self.assertIsNone(data[0]["concentration"])
@@ -0,0 +1,47 @@
+import csv
+
+from django.test import TestCase
+from io import BytesIO
+
+from ..template_reader import EMPTY_ROWS_LIMIT, TemplateReadError, iter_template_rows, read_template
+
+
+TEMPLATE_CSV = b"""Preamble,,
+,,
+#,Name,Value
+1, a ,x
+2,,
+,b,y
+"""
+
+
+class TemplateReaderTestCase(TestCase):
+    def test_read_template(self):
+        dataset = read_template(BytesIO(TEMPLATE_CSV), "template.csv", preamble_rows=2)
+        self.assertListEqual(dataset.headers, ["#", "Name", "Value"])
+        self.assertListEqual([list(r) for r in dataset], [["1", "a", "x"], ["", "b", "y"]])
+
+    def test_max_rows(self):
+        self.assertEqual(read_template(BytesIO(TEMPLATE_CSV), "template.csv", preamble_rows=2, max_rows=2).height, 2)
+
+        with self.assertRaises(TemplateReadError):
+            read_template(BytesIO(TEMPLATE_CSV), "template.csv", preamble_rows=2, max_rows=1)
+
+    def test_missing_header(self):
+        with self.assertRaises(TemplateReadError):
+            read_template(BytesIO(TEMPLATE_CSV), "template.csv", preamble_rows=10)
+
+    def test_malformed_csv(self):
+        with self.assertRaisesRegex(TemplateReadError, "^Line 7 "):
+            read_template(BytesIO(TEMPLATE_CSV + "3,é,z\n".encode("latin-1")), "template.csv", preamble_rows=2)
+
+        with self.assertRaisesRegex(TemplateReadError, "^Line 7 "):
+            field = b"a" * (csv.field_size_limit() + 1)
+            read_template(BytesIO(TEMPLATE_CSV + b"3," + field + b",z\n"), "template.csv", preamble_rows=2)
+
+    def test_trailing_empty_rows(self):
+        data = TEMPLATE_CSV + b",,\n" * EMPTY_ROWS_LIMIT + b"3,c,z\n"
+        self.assertEqual(len(list(iter_template_rows(BytesIO(data), xlsx=False))), 6)
+
+        data = TEMPLATE_CSV + b",,\n" * (EMPTY_ROWS_LIMIT - 1) + b"3,c,z\n"
+        self.assertEqual(len(list(iter_template_rows(BytesIO(data), xlsx=False))), 6 + EMPTY_ROWS_LIMIT)
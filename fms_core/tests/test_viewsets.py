@@ -0,0 +1,78 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from ..containers import CONTAINER_KINDS
+from ..models import Container
+from ..viewsets import MAX_ID, ContainerKindViewSet, ContainerViewSet
+
+
+class ContainerKindViewSetTestCase(TestCase):
+    def test_list(self):
+        view = ContainerKindViewSet.as_view({"get": "list"})
+
+        response = view(APIRequestFactory().get("/container-kinds/"))
+        response.render()
+        self.assertEqual(response.status_code, 200)
+        self.assertListEqual(response.data, CONTAINER_KINDS)
+        self.assertIn("no-cache", response["Cache-Control"])
+        etag = response["ETag"]
+
+        response = view(APIRequestFactory().get("/container-kinds/", HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+        # Each rendering of the kinds has its own ETag
+        response = view(APIRequestFactory().get("/container-kinds/", HTTP_ACCEPT="text/html"))
+        response.render()
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+class ContainerViewSetTestCase(TestCase):
+    def setUp(self) -> None:
+        self.user = User.objects.create_user("jdoe", password="password")
+
+        self.building = Container.objects.create(kind="room", name="Building01", barcode="Building01")
+        self.floor = Container.objects.create(kind="room", name="Floor01", barcode="Floor01", location=self.building)
+        self.room = Container.objects.create(kind="room", name="Room01", barcode="Room01", location=self.floor)
+        self.box = Container.objects.create(kind="box", name="Box01", barcode="Box01", location=self.room)
+        self.tube = Container.objects.create(kind="tube", name="Tube01", barcode="Tube01", location=self.box)
+
+    def get(self, action, params=None, **kwargs):
+        request = APIRequestFactory().get("/containers/", params)
+        force_authenticate(request, user=self.user)
+        return ContainerViewSet.as_view({"get": action})(request, **kwargs)
+
+    def test_list_parents(self):
+        response = self.get("list_parents", pk=self.tube.pk)
+        self.assertListEqual([c["barcode"] for c in response.data], ["Building01", "Floor01", "Room01", "Box01"])
+
+        response = self.get("list_parents", pk=self.building.pk)
+        self.assertListEqual(response.data, [])
+
+        response = self.get("list_parents", pk=self.tube.pk + 1000)
+        self.assertEqual(response.status_code, 404)
+
+    def test_ancestors(self):
+        response = self.get("ancestors", {"ids": f"{self.tube.pk},{self.room.pk},{self.building.pk}"})
+        self.assertDictEqual({i: [c["barcode"] for c in cs] for i, cs in response.data.items()}, {
+            self.tube.pk: ["Building01", "Floor01", "Room01", "Box01"],
+            self.room.pk: ["Building01", "Floor01"],
+            self.building.pk: [],
+        })
+
+        response = self.get("ancestors", {"ids": "1,a"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_search(self):
+        def search(q):
+            response = self.get("search", {"q": q})
+            self.assertEqual(response.status_code, 200)
+            return {c["barcode"] for c in response.data["results"]}
+
+        # Numeric input also matches IDs
+        self.assertIn("Box01", search(str(self.box.pk)))
+        self.assertSetEqual(search(str(MAX_ID + 1)), set())
+        self.assertSetEqual(search("room"), {"Room01"})
+        self.assertSetEqual(search("01"), {"Building01", "Floor01", "Room01", "Box01", "Tube01"})
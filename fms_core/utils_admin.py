@@ -27,6 +27,7 @@
 import tablib
 import os
 import time
+from io import BytesIO
 from django.conf import settings
 from django.core.exceptions import PermissionDenied
 from django.utils.decorators import method_decorator
@@ -36,6 +37,7 @@ from import_export.admin import ImportMixin, ExportActionMixin, ExportMixin
 from import_export.formats.base_formats import CSV, TablibFormat
 from reversion.admin import VersionAdmin
 from .models import ImportedFile
+from .template_reader import iter_template_rows
 
 
 __all__ = [
@@ -64,27 +66,25 @@ class PaddedXLSX(TablibFormat):
         """
         Create dataset from first sheet.
         """
-        from io import BytesIO
-        import openpyxl
-        xlsx_book = openpyxl.load_workbook(BytesIO(in_stream), read_only=True)
-
         dataset = tablib.Dataset()
-        sheet = xlsx_book.active
 
-        # obtain generator
-        rows = sheet.rows
+        # obtain generator, which stops at the trailing empty rows of the sheet;
+        # formulas are imported as is, rather than as their cached values
+        rows = iter_template_rows(BytesIO(in_stream), xlsx=True, data_only=False)
 
-        headers = [cell.value for cell in next(rows)]
+        headers = list(next(rows, ()))
         max_dim = len(headers)
-        row_values = []
 
+        # rows are appended as they are read; rows are padded to the width of the
+        # sheet, so the dataset seldom has to be widened for a longer row
         for row in rows:
-            row_value = [cell.value for cell in row]
-            max_dim = max(max_dim, len(row_value))
-            row_values.append(row_value)
+            if len(row) > max_dim:
+                for _ in range(len(row) - max_dim):
+                    dataset.append_col([None] * dataset.height)
+                max_dim = len(row)
+            dataset.append(padded_nones(list(row), max_dim))
 
         dataset.headers = padded_nones(headers, max_dim)
-        dataset.extend([padded_nones(r, max_dim) for r in row_values])
 
         return dataset
 
@@ -1,21 +1,30 @@
 import json
 
-from collections import Counter
-from django.conf import settings
 from django.contrib.auth.models import User, Group
-from django.db.models import Count, Q, Func, F
-from django.db.models.functions import Greatest
+from django.db import connection
+from django.core.files.uploadedfile import UploadedFile
+from django.db.models import Count, Q, prefetch_related_objects
 from django.http.response import HttpResponseNotFound, HttpResponseBadRequest
+from django.shortcuts import get_object_or_404
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated, DjangoModelPermissions
 from rest_framework.response import Response
 from reversion.models import Version
-from tablib import Dataset
-from typing import Any, Dict, List, Tuple, Union
-
-from .containers import ContainerSpec, CONTAINER_KIND_SPECS, PARENT_CONTAINER_KINDS, SAMPLE_CONTAINER_KINDS
-from .models import Container, Sample, Individual, SampleKind
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from .caching import cached_for_tables, conditional_for_tables, conditional_response
+from .containers import (
+    CONTAINER_KIND_SPECS,
+    CONTAINER_KINDS,
+    CONTAINER_KINDS_ETAG,
+    PARENT_CONTAINER_KINDS,
+    SAMPLE_CONTAINER_KINDS,
+)
+from .exports import EXPORT_RENDERER_CLASSES, StreamingExportMixin, export_labels
+from .jobs import check_template, queue_checked_import_job, queue_import_job
+from .models import Container, Sample, Individual, SampleKind, ImportJob, FieldChange
+from .pagination import KeysetPagination
 from .resources import (
     ContainerResource,
     ContainerMoveResource,
@@ -24,6 +33,7 @@ from .resources import (
     SampleResource,
     SampleUpdateResource,
 )
+from .search import global_search
 from .serializers import (
     ContainerSerializer,
     ContainerExportSerializer,
@@ -32,7 +42,10 @@ from .serializers import (
     SampleExportSerializer,
     NestedSampleSerializer,
     IndividualSerializer,
+    ImportJobSerializer,
     VersionSerializer,
+    VersionSummarySerializer,
+    FieldChangeSerializer,
     UserSerializer,
     GroupSerializer,
 )
@@ -44,11 +57,14 @@ from .template_paths import (
     SAMPLE_SUBMISSION_TEMPLATE,
     SAMPLE_UPDATE_TEMPLATE,
 )
+from .template_reader import TemplateReadError
 
 __all__ = [
     "ContainerKindViewSet",
     "ContainerViewSet",
+    "FieldChangeViewSet",
     "IndividualViewSet",
+    "ImportJobViewSet",
     "QueryViewSet",
     "SampleViewSet",
     "SampleKindViewSet",
@@ -67,10 +83,16 @@ NULLABLE_FK_FILTERS = [*FK_FILTERS, "isnull"]
 SCALAR_FILTERS = ["exact", "lt", "lte", "gt", "gte"]
 DATE_FILTERS = [*SCALAR_FILTERS, "year", "month", "week", "week_day", "day"]
 
+MAX_ID = 2 ** 31 - 1
+
 
-def versions_detail(obj):
+def versions_detail(request, obj):
     versions = Version.objects.get_for_object(obj)
-    serializer = VersionSerializer(versions, many=True)
+    # Versions are listed in full unless requested in compact form; see VersionSummarySerializer
+    if request.query_params.get("compact") == "true":
+        serializer = VersionSummarySerializer(VersionSummarySerializer.get_summary_queryset(versions), many=True)
+    else:
+        serializer = VersionSerializer(versions.select_related("content_type", "revision"), many=True)
     return Response(serializer.data)
 
 
@@ -80,7 +102,8 @@ class ContainerKindViewSet(viewsets.ViewSet):
     permission_classes = [AllowAny]
 
     def list(self, request):
-        return Response(data=[s.serialize() for s in ContainerSpec.container_specs])
+        # The kinds never change while the application runs; the ETag lets clients skip downloading them again
+        return conditional_response(request, (CONTAINER_KINDS_ETAG,), lambda: Response(CONTAINER_KINDS))
 
     def retrieve(self, request, pk=None):
         if pk in CONTAINER_KIND_SPECS:
@@ -95,42 +118,35 @@ class TemplateActionsMixin:
     template_action_list = []
 
     @classmethod
-    def _get_action(cls, request) -> Tuple[bool, Union[str, Tuple[dict, Dataset]]]:
+    def _get_action(cls, request, template_required: bool = True) \
+            -> Tuple[bool, Union[str, Tuple[dict, Optional[UploadedFile]]]]:
         """
         Gets template action from request data. Requests should be
         multipart/form-data, with two key-value pairs:
             action: index of the template action (based on the list provided by template_actions/)
-            template: completed template file with data
+            template: completed template file with data (optional if template_required is False)
         Returns a tuple of:
             bool
                 True if an error occurred, False if the request was processed
-                to the point of reading the file into a dataset.
-            Union[str, Tuple[dict, Dataset]]
+                to the point of finding the action and the uploaded file.
+            Union[str, Tuple[dict, Optional[UploadedFile]]]
                 str if an error occured, where the string is the error message.
-                Dataset otherwise, with the contents of the uploaded file.
+                The action definition and the uploaded file otherwise.
         """
 
         action_id = request.POST.get("action")
         template_file = request.FILES.get("template")
 
-        if action_id is None or template_file is None:
+        if action_id is None or (template_file is None and template_required):
             return True, "Action or template file not found"
 
         try:
             action_def = cls.template_action_list[int(action_id)]
-        except (KeyError, ValueError):
+        except (IndexError, ValueError):
             # If the action index is out of bounds or not int-castable, return an error.
             return True, f"Action {action_id} not found"
 
-        # There are only two file types accepted; .xlsx and .csv. XLSX files
-        # must be treated differently since it's binary data.
-
-        xlsx = template_file.name.endswith("xlsx")
-        file_bytes = template_file.read()
-
-        dataset = Dataset().load(file_bytes if xlsx else file_bytes.decode("utf-8"), format="xlsx" if xlsx else "csv")
-
-        return False, (action_def, dataset)
+        return False, (action_def, template_file)
 
     @action(detail=False, methods=["get"])
     def template_actions(self, request):
@@ -147,58 +163,59 @@ class TemplateActionsMixin:
     def template_check(self, request):
         """
         Checks a template submission without saving any of the data to the
-        database. Used to check for errors prior to final submission.
+        database. Used to check for errors prior to final submission. The
+        returned check_token can be passed to template_submit instead of
+        uploading the template again.
         """
 
         error, action_data = self._get_action(request)
         if error:
             return HttpResponseBadRequest(json.dumps({"detail": action_data}), content_type="application/json")
 
-        action_def, dataset = action_data
+        action_def, template_file = action_data
 
-        resource_instance = action_def["resource"]()
-        result = resource_instance.import_data(dataset, dry_run=True)
+        try:
+            token, result = check_template(template_file, action_def["resource"], request.user,
+                                           action_def.get("max_rows"))
+        except TemplateReadError as e:
+            return HttpResponseBadRequest(json.dumps({"detail": str(e)}), content_type="application/json")
 
-        return Response({
-            "valid": not (result.has_errors() or result.has_validation_errors()),
-            "base_errors": [{
-                "error": str(e.error),
-                "traceback": e.traceback if settings.DEBUG else "",
-            } for e in result.base_errors],
-            "rows": [{
-                "errors": [{
-                    "error": str(e.error),
-                    "traceback": e.traceback if settings.DEBUG else "",
-                } for e in r.errors],
-                "validation_error": r.validation_error,
-                "diff": r.diff,
-                "import_type": r.import_type,
-            } for r in result.rows],  # TODO
-        })
+        return Response({**result, "check_token": token})
 
     @action(detail=False, methods=["post"])
     def template_submit(self, request):
         """
         Submits a template action. Should be done only after an initial check,
-        since this endpoint does not return any helpful error messages. Will
-        save any submitted data to the database unless an error occurs.
+        since this endpoint does not return any helpful error messages. The
+        template is queued for import by a background worker; the returned
+        import job can be polled for progress and for the result. Nothing is
+        saved to the database if any error occurs during the import.
+        Either the template file or the check_token returned by
+        template_check must be specified; with a token, the template parsed
+        and resolved during the check is re-used.
         """
 
-        error, action_data = self._get_action(request)
+        check_token = request.POST.get("check_token", "")
+
+        error, action_data = self._get_action(request, template_required=not check_token)
         if error:
             return HttpResponseBadRequest(json.dumps({"detail": action_data}), content_type="application/json")
 
-        action_def, dataset = action_data
+        action_def, template_file = action_data
+        resource_class, max_rows = action_def["resource"], action_def.get("max_rows")
 
-        resource_instance = action_def["resource"]()
-        result = resource_instance.import_data(dataset)
+        job = None
+        if check_token:
+            job = queue_checked_import_job(check_token, resource_class, request.user, max_rows)
 
-        if result.has_errors() or result.has_validation_errors():
-            # TODO: Better message
-            return HttpResponseBadRequest(json.dumps({"detail": "Template errors encountered in submission"}),
-                                          content_type="application/json")
+        if job is None:
+            if template_file is None:
+                return HttpResponseBadRequest(
+                    json.dumps({"detail": "Template check has expired; please check the template again"}),
+                    content_type="application/json")
+            job = queue_import_job(template_file, resource_class, request.user, max_rows)
 
-        return Response(status=204)
+        return Response(ImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
 
 
 def _prefix_keys(prefix: str, d: Dict[str, Any]) -> Dict[str, Any]:
@@ -208,6 +225,20 @@ def _list_keys(d: Dict[str, Any]) -> Dict[str, Any]:
     return [k  for k, v in d.items()]
 
 
+def _search_query(search_input: str, fields: Tuple[str, ...]) -> Q:
+    """
+    Builds a query for substring matches on the specified fields (served by
+    trigram indexes), or for an exact ID match if the input is numeric.
+    """
+    query = Q()
+    for field in fields:
+        query |= Q(**{f"{field}__icontains": search_input})
+    # IDs are 32-bit integers; larger values would make Postgres raise an error
+    if search_input.isdecimal() and 1 <= int(search_input) <= MAX_ID:
+        query |= Q(pk=int(search_input))
+    return query
+
+
 FiltersetFields = Dict[str, List[str]]
 
 
@@ -253,6 +284,7 @@ _sample_filterset_fields: FiltersetFields = {
     "id": PK_FILTERS,
     "name": CATEGORICAL_FILTERS_LOOSE,
     "sample_kind": FK_FILTERS,
+    "current_volume": SCALAR_FILTERS,
     "concentration": SCALAR_FILTERS,
     "depleted": ["exact"],
     "collection_site": CATEGORICAL_FILTERS_LOOSE,
@@ -276,9 +308,11 @@ _sample_minimal_filterset_fields: FiltersetFields = {
     "name": CATEGORICAL_FILTERS_LOOSE,
 }
 
-class ContainerViewSet(viewsets.ModelViewSet, TemplateActionsMixin):
+
+class ContainerViewSet(viewsets.ModelViewSet, TemplateActionsMixin, StreamingExportMixin):
     queryset = Container.objects.select_related("location").prefetch_related("children", "samples").all()
     serializer_class = ContainerSerializer
+    pagination_class = KeysetPagination
     filterset_fields = {
         **_container_filterset_fields,
         **_prefix_keys("location__", _container_filterset_fields),
@@ -289,32 +323,28 @@ class ContainerViewSet(viewsets.ModelViewSet, TemplateActionsMixin):
         {
             "name": "Add Containers",
             "description": "Upload the provided template with up to 100 new containers.",
+            "max_rows": 100,
             "template": CONTAINER_CREATION_TEMPLATE,
             "resource": ContainerResource,
         },
         {
             "name": "Move Containers",
             "description": "Upload the provided template with up to 100 containers to move.",
+            "max_rows": 100,
             "template": CONTAINER_MOVE_TEMPLATE,
             "resource": ContainerMoveResource,
         },
         {
             "name": "Rename Containers",
             "description": "Upload the provided template with up to 384 containers to rename.",
+            "max_rows": 384,
             "template": CONTAINER_RENAME_TEMPLATE,
             "resource": ContainerRenameResource,
         },
     ]
 
-    def get_renderer_context(self):
-        context = super().get_renderer_context()
-        if self.action == 'list_export':
-            fields = ContainerExportSerializer.Meta.fields
-            context['header'] = fields
-            context['labels'] = {i: i.replace('_', ' ').capitalize() for i in fields}
-        return context
-
     @action(detail=False, methods=["get"])
+    @conditional_for_tables(Container)
     def summary(self, _request):
         """
         Returns summary statistics about the current set of containers in the
@@ -352,12 +382,11 @@ class ContainerViewSet(viewsets.ModelViewSet, TemplateActionsMixin):
         """
         Searches for parent containers that match the given query
         """
-        search_input = _request.GET.get("q")
+        search_input = _request.GET.get("q", "")
         is_parent = _request.GET.get("parent") == 'true'
         is_sample_holding = _request.GET.get("sample_holding") == 'true'
 
-        query = Q(name__icontains=search_input)
-        query.add(Q(id__icontains=search_input), Q.OR)
+        query = _search_query(search_input, ("name",))
         if is_parent:
             query.add(Q(kind__in=PARENT_CONTAINER_KINDS), Q.AND)
         if is_sample_holding:
@@ -368,9 +397,15 @@ class ContainerViewSet(viewsets.ModelViewSet, TemplateActionsMixin):
         serializer = self.get_serializer(page, many=True)
         return self.get_paginated_response(serializer.data)
 
-    @action(detail=False, methods=["get"])
-    def list_export(self, _request):
-        serializer = ContainerExportSerializer(self.filter_queryset(self.get_queryset()), many=True)
+    @action(detail=False, methods=["get"], renderer_classes=EXPORT_RENDERER_CLASSES)
+    def list_export(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        # CSV and XLSX exports are streamed; other formats are rendered as usual
+        response = self.export_response(request, queryset, ContainerExportSerializer, "containers",
+                                        labels=export_labels(ContainerExportSerializer.Meta.fields))
+        if response is not None:
+            return response
+        serializer = ContainerExportSerializer(queryset, many=True)
         return Response(serializer.data)
 
     @action(detail=True, methods=["get"])
@@ -386,18 +421,66 @@ class ContainerViewSet(viewsets.ModelViewSet, TemplateActionsMixin):
     def list_parents(self, _request, pk=None):
         """
         Traverses a container's parent hierarchy and returns a list, in order
-        from closest-to-root to the queried container, of all the containers in
-        that tree traversal.
-        """
-        containers = []
-        current = Container.objects.get(pk=pk).location
-        while current:
-            containers.append(current)
-            current = current.location
-        containers.reverse()
+        from closest-to-root to the queried container's direct parent, of all
+        the containers in that tree traversal.
+        """
+        container = get_object_or_404(Container.objects.only("id"), pk=pk)
+        containers = Container.get_ancestors((container.pk,))[container.pk]
+        prefetch_related_objects(containers, "children", "samples")
         serializer = self.get_serializer(containers, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=["get"])
+    def ancestors(self, request):
+        """
+        Returns the parent hierarchies of many containers at once, specified
+        as a comma-separated list of IDs (?ids=1,2,3). The response maps each
+        container ID to its list of ancestors, in order from closest-to-root
+        to the direct parent, as in list_parents.
+        """
+        try:
+            ids = [int(i) for i in request.GET.get("ids", "").split(",") if i.strip()]
+        except ValueError:
+            return HttpResponseBadRequest(json.dumps({"detail": "ids must be a comma-separated list of IDs"}),
+                                          content_type="application/json")
+
+        ancestors = Container.get_ancestors(ids)
+        prefetch_related_objects(list({c.pk: c for cs in ancestors.values() for c in cs}.values()),
+                                 "children", "samples")
+        return Response({i: self.get_serializer(cs, many=True).data for i, cs in ancestors.items()})
+
+    @action(detail=True, methods=["get"])
+    def descendants(self, _request, pk=None):
+        """
+        Lists all containers nested, at any depth, within a specified
+        container. Supports the same filters as the container list.
+        """
+        container = get_object_or_404(Container.objects.only("id", "path"), pk=pk)
+        containers_data = self.filter_queryset(self.get_queryset()).filter(
+            path__startswith=container.subtree_path)
+        page = self.paginate_queryset(containers_data)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(containers_data, many=True)
+        return Response(serializer.data)
+
+    @action(detail=True, methods=["get"])
+    def subtree_samples(self, _request, pk=None):
+        """
+        Lists all samples stored anywhere within a specified container,
+        including within any containers nested inside of it.
+        """
+        container = get_object_or_404(Container.objects.only("id", "path"), pk=pk)
+        subtree = Container.objects.filter(Q(pk=container.pk) | Q(path__startswith=container.subtree_path))
+        samples_data = Sample.objects.filter(container__in=subtree.values("pk")).order_by("id")
+        page = self.paginate_queryset(samples_data)
+        if page is not None:
+            serializer = SampleSerializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = SampleSerializer(samples_data, many=True)
+        return Response(serializer.data)
+
     @action(detail=True, methods=["get"])
     def list_samples(self, _request, pk=None):
         """
@@ -413,7 +496,7 @@ class ContainerViewSet(viewsets.ModelViewSet, TemplateActionsMixin):
         """
         Lists all django_reversion Version objects associated with a container.
         """
-        return versions_detail(self.get_object())
+        return versions_detail(request, self.get_object())
 
 
 class SampleKindViewSet(viewsets.ModelViewSet):
@@ -422,9 +505,50 @@ class SampleKindViewSet(viewsets.ModelViewSet):
     pagination_class = None
     permission_classes = [AllowAny]
 
-
-class SampleViewSet(viewsets.ModelViewSet, TemplateActionsMixin):
+    @conditional_for_tables(SampleKind)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+
+# All sample summary counts, computed in a single round trip. Experimental groups are arrays of group names, which
+# are unnested so that each sample counts once towards every group it belongs to.
+SAMPLE_SUMMARY_QUERY = f"""
+SELECT
+    (SELECT COUNT(*) FROM {Sample._meta.db_table}),
+    (SELECT COUNT(*) FROM {Sample._meta.db_table} WHERE extracted_from_id IS NOT NULL),
+    (SELECT COALESCE(SUM(current_volume), 0) FROM {Sample._meta.db_table}),
+    (SELECT COALESCE(json_object_agg(sk.name, c.count), '{{}}')
+     FROM (SELECT sample_kind_id, COUNT(*) FROM {Sample._meta.db_table} GROUP BY sample_kind_id) c
+     JOIN {SampleKind._meta.db_table} sk ON sk.id = c.sample_kind_id),
+    (SELECT COALESCE(json_object_agg(c.tissue_source, c.count), '{{}}')
+     FROM (SELECT tissue_source, COUNT(*) FROM {Sample._meta.db_table} GROUP BY tissue_source) c),
+    (SELECT COALESCE(json_object_agg(c.collection_site, c.count), '{{}}')
+     FROM (SELECT collection_site, COUNT(*) FROM {Sample._meta.db_table} GROUP BY collection_site) c),
+    (SELECT COALESCE(json_object_agg(c.experimental_group, c.count), '{{}}')
+     FROM (SELECT jsonb_array_elements_text(experimental_group) AS experimental_group, COUNT(*)
+           FROM {Sample._meta.db_table} GROUP BY 1) c)
+"""
+
+
+def _sample_summary() -> dict:
+    with connection.cursor() as cursor:
+        cursor.execute(SAMPLE_SUMMARY_QUERY)
+        row = cursor.fetchone()
+
+    return dict(zip((
+        "total_count",
+        "extracted_count",
+        "total_volume",
+        "kinds_counts",
+        "tissue_source_counts",
+        "collection_site_counts",
+        "experimental_group_counts",
+    ), row))
+
+
+class SampleViewSet(viewsets.ModelViewSet, TemplateActionsMixin, StreamingExportMixin):
     queryset = Sample.objects.all().select_related("individual", "container", "sample_kind")
+    pagination_class = KeysetPagination
     ordering_fields = (
         *_list_keys(_sample_filterset_fields),
     )
@@ -438,18 +562,21 @@ class SampleViewSet(viewsets.ModelViewSet, TemplateActionsMixin):
         {
             "name": "Add Samples",
             "description": "Upload the provided template with up to 384 new samples.",
+            "max_rows": 384,
             "template": SAMPLE_SUBMISSION_TEMPLATE,
             "resource": SampleResource,
         },
         {
             "name": "Process Extractions",
             "description": "Upload the provided template with up to 96 extractions.",
+            "max_rows": 96,
             "template": SAMPLE_EXTRACTION_TEMPLATE,
             "resource": ExtractionResource,
         },
         {
             "name": "Update Samples",
             "description": "Upload the provided template with up to 384 samples to update.",
+            "max_rows": 384,
             "template": SAMPLE_UPDATE_TEMPLATE,
             "resource": SampleUpdateResource,
         }
@@ -465,20 +592,19 @@ class SampleViewSet(viewsets.ModelViewSet, TemplateActionsMixin):
             return NestedSampleSerializer
         return SampleSerializer
 
-    def get_renderer_context(self):
-        context = super().get_renderer_context()
-        if self.action == 'list_export':
-            fields = SampleExportSerializer.Meta.fields
-            context['header'] = fields
-            context['labels'] = {i: i.replace('_', ' ').capitalize() for i in fields}
-        return context
-
-    @action(detail=False, methods=["get"])
-    def list_export(self, _request):
-        serializer = SampleExportSerializer(self.filter_queryset(self.get_queryset()), many=True)
+    @action(detail=False, methods=["get"], renderer_classes=EXPORT_RENDERER_CLASSES)
+    def list_export(self, request):
+        queryset = SampleExportSerializer.get_export_queryset(self.filter_queryset(self.get_queryset()))
+        # CSV and XLSX exports are streamed; other formats are rendered as usual
+        response = self.export_response(request, queryset, SampleExportSerializer, "samples",
+                                        labels=export_labels(SampleExportSerializer.Meta.fields))
+        if response is not None:
+            return response
+        serializer = SampleExportSerializer(queryset, many=True)
         return Response(serializer.data)
 
     @action(detail=False, methods=["get"])
+    @conditional_for_tables(Sample)
     def list_collection_sites(self, _request):
         samples_data = Sample.objects.filter().distinct("collection_site")
         collection_sites = [s.collection_site for s in samples_data]
@@ -489,11 +615,9 @@ class SampleViewSet(viewsets.ModelViewSet, TemplateActionsMixin):
         """
         Searches for samples that match the given query
         """
-        search_input = _request.GET.get("q")
+        search_input = _request.GET.get("q", "")
 
-        query = Q(name__icontains=search_input)
-        query.add(Q(alias__icontains=search_input), Q.OR)
-        query.add(Q(id__icontains=search_input), Q.OR)
+        query = _search_query(search_input, ("name", "alias"))
 
         samples_data = Sample.objects.filter(query)
         page = self.paginate_queryset(samples_data)
@@ -501,55 +625,40 @@ class SampleViewSet(viewsets.ModelViewSet, TemplateActionsMixin):
         return self.get_paginated_response(serializer.data)
 
     @action(detail=False, methods=["get"])
+    @conditional_for_tables(Sample, SampleKind)
     def summary(self, _request):
         """
         Returns summary statistics about the current set of samples in the
         database.
         """
 
-        experimental_groups = Counter()
-        for eg in Sample.objects.values_list("experimental_group", flat=True):
-            experimental_groups.update(eg)
-
-        sample_kind_names_by_id = {sample_kind.id: sample_kind.name for sample_kind in SampleKind.objects.all()}
-
-        return Response({
-            "total_count": Sample.objects.all().count(),
-            "extracted_count": Sample.objects.filter(extracted_from_id__isnull=False).count(),
-            "kinds_counts": {
-                sample_kind_names_by_id[c["sample_kind"]]: c["sample_kind__count"]
-                for c in Sample.objects.values("sample_kind").annotate(Count("sample_kind"))
-            },
-            "tissue_source_counts": {
-                c["tissue_source"]: c["tissue_source__count"]
-                for c in Sample.objects.values("tissue_source").annotate(Count("tissue_source"))
-            },
-            "collection_site_counts": {
-                c["collection_site"]: c["collection_site__count"]
-                for c in Sample.objects.values("collection_site").annotate(Count("collection_site"))
-            },
-            "experimental_group_counts": dict(experimental_groups),
-        })
+        return Response(cached_for_tables("sample_summary", (Sample, SampleKind), _sample_summary))
 
     # noinspection PyUnusedLocal
     @action(detail=True, methods=["get"])
-    def versions(self, _request, pk=None):
-        return versions_detail(self.get_object())
+    def versions(self, request, pk=None):
+        return versions_detail(request, self.get_object())
 
 
-class IndividualViewSet(viewsets.ModelViewSet):
+class IndividualViewSet(viewsets.ModelViewSet, StreamingExportMixin):
     queryset = Individual.objects.all()
     serializer_class = IndividualSerializer
+    pagination_class = KeysetPagination
     filterset_fields = _individual_filterset_fields
 
     # noinspection PyUnusedLocal
     @action(detail=True, methods=["get"])
     def versions(self, request, pk=None):
-        return versions_detail(self.get_object())
-
-    @action(detail=False, methods=["get"])
-    def list_export(self, _request):
-        serializer = IndividualSerializer(self.filter_queryset(self.get_queryset()), many=True)
+        return versions_detail(request, self.get_object())
+
+    @action(detail=False, methods=["get"], renderer_classes=EXPORT_RENDERER_CLASSES)
+    def list_export(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        # CSV and XLSX exports are streamed; other formats are rendered as usual
+        response = self.export_response(request, queryset, IndividualSerializer, "individuals")
+        if response is not None:
+            return response
+        serializer = IndividualSerializer(queryset, many=True)
         return Response(serializer.data)
 
     @action(detail=False, methods=["get"])
@@ -557,31 +666,26 @@ class IndividualViewSet(viewsets.ModelViewSet):
         """
         Searches for individuals that match the given query
         """
-        search_input = _request.GET.get("q")
+        search_input = _request.GET.get("q", "")
 
-        query = Q(id__icontains=search_input)
-        query.add(Q(name__icontains=search_input), Q.OR)
+        query = _search_query(search_input, ("name",))
 
         individuals_data = Individual.objects.filter(query)
         page = self.paginate_queryset(individuals_data)
         serializer = self.get_serializer(page, many=True)
         return self.get_paginated_response(serializer.data)
 
-class FZY(Func):
-    template = "%(function)s('%(search_term)s', %(expressions)s::cstring)"
-    function = "fzy"
-
-    def __init__(self, expression, search_term, **extras):
-        super(FZY, self).__init__(
-            expression,
-            search_term=search_term,
-            **extras
-        )
-
 # noinspection PyMethodMayBeStatic,PyUnusedLocal
 class QueryViewSet(viewsets.ViewSet):
     basename = "query"
 
+    result_serializers = {
+        "container": ContainerSerializer,
+        "individual": IndividualSerializer,
+        "sample": SampleSerializer,
+        "user": UserSerializer,
+    }
+
     @action(detail=False, methods=["get"])
     def search(self, request):
         query = request.GET.get("q")
@@ -589,56 +693,16 @@ class QueryViewSet(viewsets.ViewSet):
         if not query:
             return Response([])
 
-        def serialize(s) -> dict:
-            item_type = s["type"]
-            s["score"] = s["item"].score
-            if item_type == Container:
-                s["type"] = "container"
-                s["item"] = ContainerSerializer(s["item"]).data
-                return s
-            if item_type == Sample:
-                s["type"] = "sample"
-                s["item"] = SampleSerializer(s["item"]).data
-                return s
-            if item_type == Individual:
-                s["type"] = "individual"
-                s["item"] = IndividualSerializer(s["item"]).data
-                return s
-            if item_type == User:
-                s["type"] = "user"
-                s["item"] = UserSerializer(s["item"]).data
-                return s
-            raise ValueError("unreachable")
-
-        def query_and_score(model, fields):
-            scores = list(map(lambda f: FZY(F(f), query), fields))
-            scores = scores[0] if len(scores) == 1 else Greatest(*scores)
-            return [{
-                "type": model,
-                "item": s
-            } for s in model.objects
-                .annotate(
-                    score=scores
-                )
-                .filter(score__gt=0)
-                .order_by('-score')[:100]
-            ]
-
-        containers = query_and_score(Container, ["name"])
-        individuals = query_and_score(Individual, ["name"])
-        samples = query_and_score(Sample, ["name"])
-        users = query_and_score(User, ["username", "first_name", "last_name"])
-
-        results = containers + individuals + samples + users
-        results.sort(key=lambda c: c["item"].score, reverse=True)
-        data = map(serialize, results[:100])
-
-        return Response(data)
+        return Response([
+            {**r, "item": self.result_serializers[r["type"]](r["item"]).data}
+            for r in global_search(query)
+        ])
 
 
 class VersionViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Version.objects.all().prefetch_related("content_type", "revision")
+    queryset = Version.objects.all().select_related("content_type", "revision")
     serializer_class = VersionSerializer
+    pagination_class = KeysetPagination
     filterset_fields = {
         "object_id": FK_FILTERS,
 
@@ -653,6 +717,66 @@ class VersionViewSet(viewsets.ReadOnlyModelViewSet):
         "revision__user": ["exact"],
     }
 
+    def is_compact(self) -> bool:
+        # Full snapshots are only listed if requested; single versions are always retrieved in full
+        return self.action == "list" and self.request.query_params.get("compact") == "true"
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        return VersionSummarySerializer.get_summary_queryset(queryset) if self.is_compact() else queryset
+
+    def get_serializer_class(self):
+        return VersionSummarySerializer if self.is_compact() else super().get_serializer_class()
+
+
+class FieldChangeViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Field-level changes logged from versions, for history views and audit
+    queries (e.g. the volume changes of samples over a week.)
+    """
+
+    queryset = FieldChange.objects.all().select_related("content_type").order_by("-id")
+    serializer_class = FieldChangeSerializer
+    pagination_class = KeysetPagination
+    filterset_fields = {
+        "object_id": FK_FILTERS,
+        "field": CATEGORICAL_FILTERS,
+        "date": DATE_FILTERS,
+
+        # Content type filters
+        "content_type__id": FK_FILTERS,
+        "content_type__app_label": CATEGORICAL_FILTERS,
+        "content_type__model": CATEGORICAL_FILTERS,
+
+        # Revision filters
+        "version__id": FK_FILTERS,
+        "revision__id": FK_FILTERS,
+        "revision__user": ["exact"],
+    }
+
+
+class ImportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Template import jobs, which can be polled for progress and results.
+    Users other than staff only see the jobs they submitted.
+    """
+
+    queryset = ImportJob.objects.all().select_related("imported_file").order_by("-id")
+    serializer_class = ImportJobSerializer
+    filterset_fields = {
+        "id": PK_FILTERS,
+        "status": CATEGORICAL_FILTERS,
+        "resource": CATEGORICAL_FILTERS,
+        "created_by": FK_FILTERS,
+    }
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.user.is_staff:
+            return queryset
+        return queryset.filter(created_by=self.request.user)
+
+
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer